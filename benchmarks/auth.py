@@ -0,0 +1,59 @@
+"""
+Benchmark of authentication of request by access token.
+
+Run from project root:
+
+    python -m benchmarks.auth --requests 20000
+
+Calls deps.get_current_user with token which is verified every time
+and with token from cache of verified tokens. User is put to cache
+of users, so database is not needed.
+"""
+import argparse
+import asyncio
+from time import perf_counter
+
+from routers.deps import get_current_user
+from schemas.user import User
+from utils.users import create_access_token, token_cache, user_cache
+
+
+async def bench(token: str, count: int, cached: bool) -> float:
+    """Returns microseconds of authentication of one request"""
+    started = perf_counter()
+    for _ in range(count):
+        if not cached:
+            token_cache.clear()
+        await get_current_user(db=None, token=token)
+    return (perf_counter() - started) / count * 1e6
+
+
+async def run(count: int) -> None:
+    user = User(
+        id=1, username="user@example.com", is_active=True, is_admin=False
+    )
+    user_cache.set(user.id, user)
+    token = create_access_token({
+        "sub": user.username,
+        "id": user.id,
+        "is_active": user.is_active,
+        "is_admin": user.is_admin,
+    })
+    await bench(token, 100, cached=False)
+    print("verified every time:  %.2f us/request" % await bench(
+        token, count, cached=False
+    ))
+    print("cached token:         %.2f us/request" % await bench(
+        token, count, cached=True
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Stored results of benchmarks and comparison with them.
+"""
+import json
+import os
+from typing import Dict, List
+
+
+def load_baseline(path: str) -> Dict:
+    """Gets results stored by save_baseline, empty dict without file"""
+    try:
+        with open(path) as baseline_file:
+            return json.load(baseline_file)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(path: str, results: Dict) -> None:
+    """Stores results as baseline"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as baseline_file:
+        json.dump(results, baseline_file, indent=2, sort_keys=True)
+        baseline_file.write("\n")
+
+
+def compare(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    threshold: float,
+    lower_is_better: List[str] = (),
+    higher_is_better: List[str] = (),
+) -> List[str]:
+    """
+    Gets regressions of results against baseline.
+    Values of lower_is_better keys must not grow more than by threshold part,
+    values of higher_is_better keys must not fall more than by it.
+    """
+    regressions = []
+    for name, values in results.items():
+        for key in (*lower_is_better, *higher_is_better):
+            value = values.get(key)
+            base = baseline.get(name, {}).get(key)
+            if not base or value is None:
+                continue
+            change = (value - base) / base
+            if key in higher_is_better:
+                change = -change
+            if change > threshold:
+                regressions.append(
+                    "%s %s: %.4g, baseline %.4g (%+.0f%%)"
+                    % (name, key, value, base, (value - base) / base * 100)
+                )
+    return regressions
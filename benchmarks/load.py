@@ -0,0 +1,311 @@
+"""
+Load test of running application over HTTP.
+
+Start application and run from project root:
+
+    python -m benchmarks.load --url http://127.0.0.1:8080 --scenario all
+
+Scenarios:
+    redirects  GET of seeded short links with Zipfian popularity
+    create     POST of new long links
+    mixed      80% redirects, 10% creates, 10% pages of list
+    paging     GET of list of links page by page with cursor
+
+Links are seeded to database from settings like tests/utils.py does
+and are removed with their user after run. Results are printed as JSON
+and compared with baseline saved by --save-baseline.
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+from bisect import bisect_left
+from itertools import accumulate
+from time import perf_counter
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+from benchmarks.baseline import compare, load_baseline, save_baseline
+
+
+BASELINE_PATH = "benchmarks/baselines/load.json"
+SCENARIOS = ("redirects", "create", "mixed", "paging")
+
+
+class HTTPConnection:
+    """Minimal HTTP/1.1 client with keep-alive for one connection"""
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+
+    async def _connect(self) -> None:
+        self._reader, self._writer = await asyncio.open_connection(
+            self.host, self.port
+        )
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        headers: Optional[Dict[str, str]] = None,
+        body: bytes = b"",
+    ) -> Tuple[int, Dict[str, str], bytes]:
+        """Sends request and reads response"""
+        if self._writer is None:
+            await self._connect()
+        lines = [
+            "%s %s HTTP/1.1" % (method, path),
+            "Host: %s:%s" % (self.host, self.port),
+            "User-Agent: benchmarks.load",
+            "Content-Length: %d" % len(body),
+        ]
+        lines.extend("%s: %s" % item for item in (headers or {}).items())
+        self._writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + body)
+        head = await self._reader.readuntil(b"\r\n\r\n")
+        status_line, *header_lines = head.decode("latin-1").split("\r\n")
+        status = int(status_line.split(" ", 2)[1])
+        response_headers = {}
+        for line in header_lines:
+            if line:
+                name, _, value = line.partition(":")
+                response_headers[name.strip().lower()] = value.strip()
+        if response_headers.get("transfer-encoding") == "chunked":
+            content = await self._read_chunked()
+        else:
+            length = int(response_headers.get("content-length", 0))
+            content = await self._reader.readexactly(length)
+        if response_headers.get("connection") == "close":
+            await self.close()
+        return status, response_headers, content
+
+    async def _read_chunked(self) -> bytes:
+        chunks = []
+        while True:
+            size = int((await self._reader.readline()).split(b";")[0], 16)
+            chunk = await self._reader.readexactly(size + 2)
+            if not size:
+                return b"".join(chunks)
+            chunks.append(chunk[:-2])
+
+    async def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+class Zipf:
+    """Chooses items where k-th popular one has weight 1 / k ** exponent"""
+
+    def __init__(self, items: List[str], exponent: float, rng: random.Random):
+        self.items = list(items)
+        rng.shuffle(self.items)
+        self.cum_weights = list(accumulate(
+            1 / rank ** exponent for rank in range(1, len(self.items) + 1)
+        ))
+
+    def choose(self, rng: random.Random) -> str:
+        point = rng.random() * self.cum_weights[-1]
+        return self.items[bisect_left(self.cum_weights, point)]
+
+
+class LoadRun:
+    """State of one scenario run shared by workers"""
+
+    def __init__(self, scenario: str, short_texts: List[str], token: str, args):
+        self.scenario = scenario
+        self.auth = {"Authorization": "Bearer %s" % token}
+        self.page_size = args.page_size
+        self.zipf = Zipf(short_texts, args.zipf, random.Random(args.seed))
+        self.latencies: List[float] = []
+        self.statuses: Dict[int, int] = {}
+        self.errors = 0
+        self.created = 0
+
+    async def timed(
+        self,
+        conn: HTTPConnection,
+        expected: int,
+        method: str,
+        path: str,
+        headers: Optional[Dict[str, str]] = None,
+        body: bytes = b"",
+    ) -> Tuple[int, Dict[str, str], bytes]:
+        """Sends request and records its latency and status"""
+        started = perf_counter()
+        response = await conn.request(method, path, headers, body)
+        self.latencies.append(perf_counter() - started)
+        status = response[0]
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if status != expected:
+            self.errors += 1
+        return response
+
+    async def redirect(self, conn, rng, state) -> None:
+        await self.timed(conn, 307, "GET", "/" + self.zipf.choose(rng))
+
+    async def create(self, conn, rng, state) -> None:
+        self.created += 1
+        body = json.dumps({
+            "text": "http://load.test/%s/%s" % (state["worker"], self.created)
+        }).encode()
+        headers = dict(self.auth, **{"Content-Type": "application/json"})
+        await self.timed(conn, 200, "POST", "/api/links", headers, body)
+
+    async def page(self, conn, rng, state) -> None:
+        query = {"limit": self.page_size}
+        if state.get("cursor"):
+            query["after"] = state["cursor"]
+        _, headers, _ = await self.timed(
+            conn, 200, "GET", "/api/links?" + urlencode(query), self.auth
+        )
+        # the last page starts list again
+        state["cursor"] = headers.get("x-next-cursor")
+
+    async def step(self, conn, rng, state) -> None:
+        """Sends requests of one step of scenario"""
+        if self.scenario == "redirects":
+            await self.redirect(conn, rng, state)
+        elif self.scenario == "create":
+            await self.create(conn, rng, state)
+        elif self.scenario == "paging":
+            await self.page(conn, rng, state)
+        else:
+            action = rng.choices(
+                (self.redirect, self.create, self.page), (80, 10, 10)
+            )[0]
+            await action(conn, rng, state)
+
+
+def percentile(values: List[float], part: float) -> float:
+    """Gets nearest-rank percentile of sorted values"""
+    index = max(int(round(part * len(values) + 0.5)) - 1, 0)
+    return values[min(index, len(values) - 1)]
+
+
+async def run_scenario(run: LoadRun, host: str, port: int, args) -> Dict:
+    """Runs workers until duration is over, returns summary"""
+    deadline = perf_counter() + args.duration
+
+    async def worker(number: int) -> None:
+        conn = HTTPConnection(host, port)
+        rng = random.Random(args.seed + number)
+        state = {"worker": "%s-%s" % (args.seed, number)}
+        try:
+            while perf_counter() < deadline:
+                await run.step(conn, rng, state)
+        finally:
+            await conn.close()
+
+    started = perf_counter()
+    await asyncio.gather(*(worker(number) for number in range(args.concurrency)))
+    duration = perf_counter() - started
+    latencies = sorted(run.latencies)
+    return {
+        "requests": len(latencies),
+        "errors": run.errors,
+        "statuses": {str(status): count for status, count in run.statuses.items()},
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(len(latencies) / duration, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+async def login(host: str, port: int, username: str, password: str) -> str:
+    conn = HTTPConnection(host, port)
+    body = urlencode({"username": username, "password": password}).encode()
+    status, _, content = await conn.request(
+        "POST",
+        "/api/token",
+        {"Content-Type": "application/x-www-form-urlencoded"},
+        body,
+    )
+    await conn.close()
+    if status != 200:
+        raise RuntimeError("Login failed with status %s" % status)
+    return json.loads(content)["access_token"]
+
+
+def seed(links: int):
+    """Creates user with links, returns session, user and short links"""
+    from db import SessionLocal
+    from models.user import User as UserModel
+    from tests.utils import create_random_link, random_email
+    from utils.users import get_pwd_context
+
+    db = SessionLocal()
+    email = random_email()
+    user = UserModel(
+        username=email, email=email, password=get_pwd_context().hash("load")
+    )
+    db.add(user)
+    db.commit()
+    short_texts = [
+        create_random_link(db, owner_id=user.id).short_text
+        for _ in range(links)
+    ]
+    return db, user, short_texts
+
+
+async def run(args) -> Dict:
+    url = urlsplit(args.url)
+    host, port = url.hostname, url.port or 80
+    db, user, short_texts = seed(args.links)
+    try:
+        token = await login(host, port, user.username, "load")
+        scenarios = SCENARIOS if args.scenario == "all" else [args.scenario]
+        results = {}
+        for scenario in scenarios:
+            results[scenario] = await run_scenario(
+                LoadRun(scenario, short_texts, token, args), host, port, args
+            )
+        return results
+    finally:
+        db.delete(user)
+        db.commit()
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument("--scenario", default="all", choices=SCENARIOS + ("all",))
+    parser.add_argument("--links", type=int, default=1000)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--zipf", type=float, default=1.1)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args()
+    results = asyncio.run(run(args))
+    print(json.dumps(results, indent=2, sort_keys=True))
+    if args.save_baseline:
+        save_baseline(args.baseline, results)
+        return
+    regressions = compare(
+        results,
+        load_baseline(args.baseline),
+        args.threshold,
+        lower_is_better=["p50_ms", "p95_ms", "p99_ms"],
+        higher_is_better=["throughput_rps"],
+    )
+    for name, summary in results.items():
+        if summary["errors"]:
+            regressions.append("%s: %s unexpected statuses" % (
+                name, summary["errors"]
+            ))
+    for regression in regressions:
+        print("regression: %s" % regression, file=sys.stderr)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
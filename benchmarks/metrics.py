@@ -0,0 +1,90 @@
+"""
+Benchmark of overhead of metrics on redirect path.
+
+Run from project root:
+
+    python -m benchmarks.metrics --requests 100000
+
+Measures recording of one request in metrics and cached redirect
+by FastRedirectMiddleware with and without MetricsMiddleware.
+Redirect is put to cache, so database is not needed.
+"""
+import argparse
+import asyncio
+from datetime import datetime, timedelta
+from time import perf_counter
+
+from utils.clicks import click_aggregator
+from utils.links import RedirectEntry, redirect_cache
+from utils.metrics import MetricsMiddleware, http_request_duration, http_requests
+from utils.redirects import FastRedirectMiddleware
+
+
+class NoRoutes:
+    routes = []
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(message):
+    pass
+
+
+async def not_found(scope, receive, send):
+    raise AssertionError("Redirect is not cached")
+
+
+def bench_recording(count: int) -> float:
+    """Returns microseconds of recording one request"""
+    started = perf_counter()
+    for _ in range(count):
+        http_request_duration.observe(0.0001, "GET", "/{short_text}")
+        http_requests.inc("GET", "/{short_text}", 307)
+    return (perf_counter() - started) / count * 1e6
+
+
+async def bench_app(app, count: int) -> float:
+    """Returns microseconds of one cached redirect"""
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/bench",
+        "headers": [(b"user-agent", b"bench")],
+        "client": ("127.0.0.1", 50000),
+        "app": NoRoutes(),
+    }
+    started = perf_counter()
+    for _ in range(count):
+        await app(dict(scope), receive, send)
+    return (perf_counter() - started) / count * 1e6
+
+
+async def run(count: int) -> None:
+    click_aggregator.flush_events = count * 10
+    redirect_cache.set(
+        "bench",
+        RedirectEntry(1, "http://example.com", datetime.utcnow() + timedelta(1)),
+    )
+    fast_app = FastRedirectMiddleware(not_found)
+    measured_app = MetricsMiddleware(fast_app)
+    await bench_app(fast_app, 1000)
+    await bench_app(measured_app, 1000)
+    without = await bench_app(fast_app, count)
+    with_metrics = await bench_app(measured_app, count)
+    print("recording:           %.2f us/request" % bench_recording(count))
+    print("redirect:            %.2f us/request" % without)
+    print("redirect + metrics:  %.2f us/request" % with_metrics)
+    print("overhead:            %.2f us/request" % (with_metrics - without))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=100000)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests))
+
+
+if __name__ == "__main__":
+    main()
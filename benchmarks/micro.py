@@ -0,0 +1,195 @@
+"""
+Micro-benchmarks of hot helpers.
+
+Run from project root:
+
+    python -m benchmarks.micro
+
+Database is not needed: short codes are encoded from blocks leased
+in memory and ORM objects are not stored. Results are printed as JSON,
+best of --repeat runs is taken. Every run is preceded by calibration
+loop and its time is divided by time of the loop, so speed of machine
+and its changes during the run are taken out of comparison, and the
+committed baseline of these ratios fits other machines. Exits with
+code 1 when relative time of some helper is bigger than in baseline
+by more than threshold part, and with code 2 when there is no baseline.
+Update the baseline by --save-baseline when helpers become faster.
+"""
+import argparse
+import asyncio
+import json
+import sys
+from datetime import datetime
+from time import perf_counter
+from typing import Callable, Dict
+
+from benchmarks.baseline import compare, load_baseline, save_baseline
+
+
+BASELINE_PATH = "benchmarks/baselines/micro.json"
+CALIBRATION_NUMBER = 2000
+
+
+def summary(seconds: float, relative: float) -> Dict:
+    return {
+        "us_per_op": round(seconds * 1e6, 3),
+        "ops_per_s": round(1 / seconds, 1),
+        "relative": round(relative, 4),
+    }
+
+
+def calibration_loop() -> None:
+    """Fixed work of interpreter: calls, dicts, strings and integers"""
+    values = {}
+    for i in range(100):
+        values["key%d" % i] = i * 7 % 13
+    sum(values.values())
+
+
+def measure(func: Callable[[], None], number: int, repeat: int) -> Dict:
+    """Gets the best time of one call of func"""
+    return calibrated(lambda: _run(func, number), repeat)
+
+
+def calibrated(timer: Callable[[], float], repeat: int) -> Dict:
+    """Gets the best time and the best ratio to calibration loop run before"""
+    best = ratio = float("inf")
+    for _ in range(repeat):
+        calibration = _run(calibration_loop, CALIBRATION_NUMBER)
+        seconds = timer()
+        best = min(best, seconds)
+        ratio = min(ratio, seconds / calibration)
+    return summary(best, ratio)
+
+
+def _run(func: Callable[[], None], number: int) -> float:
+    started = perf_counter()
+    for _ in range(number):
+        func()
+    return (perf_counter() - started) / number
+
+
+def bench_short_url(number: int, repeat: int) -> Dict:
+    from utils.links import get_short_url, short_codes
+
+    short_codes.reset()
+    for block in range(number * repeat // short_codes.block_size + 1):
+        short_codes.add_block(block * short_codes.block_size + 1)
+
+    async def calls() -> float:
+        started = perf_counter()
+        for _ in range(number):
+            # blocks are leased already, so session is never used
+            await get_short_url(None)
+        return (perf_counter() - started) / number
+
+    try:
+        return calibrated(lambda: asyncio.run(calls()), repeat)
+    finally:
+        short_codes.reset()
+
+
+def bench_tokens(number: int, repeat: int) -> Dict[str, Dict]:
+    from utils.users import create_access_token, decode_access_token
+
+    claims = {
+        "sub": "user@example.com", "id": 1, "is_active": True, "is_admin": False
+    }
+    token = create_access_token(claims)
+    return {
+        "create_access_token": measure(
+            lambda: create_access_token(claims), number, repeat
+        ),
+        "decode_access_token": measure(
+            lambda: decode_access_token(token), number, repeat
+        ),
+    }
+
+
+def bench_passwords(number: int, repeat: int) -> Dict[str, Dict]:
+    from utils.users import get_pwd_context
+
+    context = get_pwd_context()
+    hashed = context.hash("password")
+    return {
+        "pwd_context.hash": measure(
+            lambda: context.hash("password"), number, repeat
+        ),
+        "pwd_context.verify": measure(
+            lambda: context.verify("password", hashed), number, repeat
+        ),
+    }
+
+
+def bench_from_orm(sizes, repeat: int) -> Dict[str, Dict]:
+    from models.link import Link as LinkModel
+    from schemas.link import Link
+
+    results = {}
+    expired = datetime.utcnow()
+    for size in sizes:
+        links = [
+            LinkModel(
+                id=i,
+                text="http://example.com/%s" % i,
+                short_text="code%s" % i,
+                expired=expired,
+                owner_id=1,
+            )
+            for i in range(size)
+        ]
+        results["Link.from_orm[%s]" % size] = measure(
+            lambda: [Link.from_orm(link) for link in links],
+            max(10000 // size, 1),
+            repeat,
+        )
+    return results
+
+
+def run(args) -> Dict[str, Dict]:
+    results = {"get_short_url": bench_short_url(args.number, args.repeat)}
+    results.update(bench_tokens(args.number, args.repeat))
+    # bcrypt is slow by design, few runs are enough
+    results.update(bench_passwords(args.hash_number, min(args.repeat, 2)))
+    results.update(bench_from_orm(args.sizes, args.repeat))
+    results["calibration"] = measure(
+        calibration_loop, CALIBRATION_NUMBER, args.repeat
+    )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--number", type=int, default=2000)
+    parser.add_argument("--hash-number", type=int, default=2)
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1, 100, 1000, 10000]
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument(
+        "--skip-baseline", action="store_true", help="only print results"
+    )
+    parser.add_argument("--threshold", type=float, default=1.0)
+    args = parser.parse_args()
+    results = run(args)
+    print(json.dumps(results, indent=2, sort_keys=True))
+    if args.save_baseline:
+        save_baseline(args.baseline, results)
+        return
+    if args.skip_baseline:
+        return
+    baseline = load_baseline(args.baseline)
+    if not baseline:
+        parser.error("no baseline in %s" % args.baseline)
+    regressions = compare(
+        results, baseline, args.threshold, lower_is_better=["relative"]
+    )
+    for regression in regressions:
+        print("regression: %s" % regression, file=sys.stderr)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
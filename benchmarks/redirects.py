@@ -0,0 +1,106 @@
+"""
+Benchmark of redirects by short links.
+
+Run from project root:
+
+    python -m benchmarks.redirects --requests 20000
+
+Compares FastAPI route GET /{short_text} with FastRedirectMiddleware.
+Requests are sent to ASGI applications directly, so HTTP server is
+not measured. Database from settings is used, links are created
+before run and removed after it.
+"""
+import argparse
+import asyncio
+from time import perf_counter
+
+from fastapi import FastAPI
+
+from db import SessionLocal, async_engine
+from routers.links import router as link_router
+from utils.clicks import click_aggregator
+from utils.links import redirect_cache
+from utils.redirects import FastRedirectMiddleware
+from tests.utils import create_random_link, create_random_user
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(message):
+    pass
+
+
+def make_scope(app, short_text: str) -> dict:
+    """Scope of GET request like uvicorn makes"""
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/" + short_text,
+        "raw_path": ("/" + short_text).encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"localhost"), (b"user-agent", b"bench")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("localhost", 8080),
+        "app": app,
+    }
+
+
+async def bench(app, scopes, cached: bool) -> float:
+    """Returns requests per second of application"""
+    started = perf_counter()
+    for scope in scopes:
+        if not cached:
+            redirect_cache.clear()
+        await app(dict(scope), receive, send)
+    return len(scopes) / (perf_counter() - started)
+
+
+async def run(requests: int, links: int) -> None:
+    db = SessionLocal()
+    user = create_random_user(db)
+    short_texts = [
+        create_random_link(db, owner_id=user.id).short_text
+        for _ in range(links)
+    ]
+    route_app = FastAPI()
+    route_app.include_router(link_router)
+    fast_app = FastRedirectMiddleware(route_app)
+    scopes = [
+        make_scope(route_app, short_texts[i % links]) for i in range(requests)
+    ]
+    try:
+        for cached in (True, False):
+            # warm up of connections and caches of compiled statements
+            await bench(route_app, scopes[:100], cached)
+            await bench(fast_app, scopes[:100], cached)
+            title = "cached" if cached else "database"
+            print("%-20s %.0f requests/s" % (
+                "route %s:" % title, await bench(route_app, scopes, cached)
+            ))
+            print("%-20s %.0f requests/s" % (
+                "fast path %s:" % title, await bench(fast_app, scopes, cached)
+            ))
+        await click_aggregator.flush()
+    finally:
+        db.delete(user)
+        db.commit()
+        db.close()
+        await async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--links", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.links))
+
+
+if __name__ == "__main__":
+    main()
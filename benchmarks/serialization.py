@@ -0,0 +1,102 @@
+"""
+Benchmark of serialization of pages of links.
+
+Run from project root:
+
+    python -m benchmarks.serialization --sizes 100 1000 10000
+
+Compares previous path (ORM objects validated by response model and
+rendered by JSONResponse) with rows of selected columns rendered by
+FastJSONResponse. Prints CPU time per page and bytes on the wire
+without compression and with gzip. Database is not needed.
+"""
+import argparse
+import asyncio
+import gzip
+from datetime import datetime
+from time import process_time
+from typing import Callable, List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+import settings
+from models.link import Link as LinkModel
+from schemas.link import Link
+from utils.responses import FastJSONResponse
+
+
+def orm_page(size: int) -> List[LinkModel]:
+    expired = datetime.utcnow()
+    return [
+        LinkModel(
+            id=i,
+            text="http://example.com/some/long/path/%s?utm_source=bench" % i,
+            short_text="code%s" % i,
+            expired=expired,
+            owner_id=1,
+        )
+        for i in range(size)
+    ]
+
+
+def measure(func: Callable[[], bytes], number: int) -> float:
+    """Gets milliseconds of CPU time of one call of func"""
+    started = process_time()
+    for _ in range(number):
+        func()
+    return (process_time() - started) / number * 1e3
+
+
+def run(sizes: List[int]) -> None:
+    field = create_response_field(name="response", type_=List[Link])
+    loop = asyncio.new_event_loop()
+    print("%8s %-10s %10s %12s %12s" % (
+        "rows", "path", "cpu ms", "bytes", "gzip bytes"
+    ))
+    for size in sizes:
+        links = orm_page(size)
+        rows = [
+            {
+                "id": link.id,
+                "text": link.text,
+                "short_text": link.short_text,
+                "expired": link.expired,
+                "owner_id": link.owner_id,
+            }
+            for link in links
+        ]
+
+        def validated() -> bytes:
+            content = loop.run_until_complete(serialize_response(
+                field=field, response_content=links
+            ))
+            return JSONResponse(content).body
+
+        def fast() -> bytes:
+            return FastJSONResponse(rows).body
+
+        number = max(10000 // size, 3)
+        for name, func in (("validated", validated), ("fast", fast)):
+            body = func()
+            print("%8d %-10s %10.3f %12d %12d" % (
+                size,
+                name,
+                measure(func, number),
+                len(body),
+                len(gzip.compress(body, compresslevel=settings.GZIP_LEVEL)),
+            ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[100, 1000, 10000]
+    )
+    args = parser.parse_args()
+    run(args.sizes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Benchmark of memory and lookups of shared redirect table.
+
+Run from project root:
+
+    python -m benchmarks.shared_table --links 1000000
+
+Builds table of --links generated links in shared memory and prints
+size of segment, bytes per million links, time of build and of lookup.
+The same links in redirect cache of one worker are measured by
+tracemalloc for comparison. Database is not needed.
+"""
+import argparse
+import os
+import tracemalloc
+from datetime import datetime
+from time import perf_counter
+
+from utils.cache import TTLLRUCache
+from utils.links import RedirectEntry
+from utils.shared_table import SharedRedirectTable
+
+
+URL = "https://example.com/articles/2022/some-article-slug-%d?utm_source=newsletter"
+
+
+def short_text(index: int) -> str:
+    return "c%07x" % index
+
+
+def run(count: int, lookups: int) -> None:
+    url_bytes = sum(len(URL % i) + len(short_text(i)) for i in range(count))
+    table = SharedRedirectTable(
+        "bench_links_%s" % os.getpid(),
+        capacity=count,
+        arena_bytes=url_bytes,
+        max_age=3600,
+    )
+    table.create()
+    try:
+        started = perf_counter()
+        table.start_build()
+        for i in range(count):
+            table.add(short_text(i), URL % i, i, 0.0)
+        table.finish_build()
+        build = perf_counter() - started
+        keys = [short_text(i * 7919 % count) for i in range(lookups)]
+        started = perf_counter()
+        for key in keys:
+            table.get(key)
+        lookup = (perf_counter() - started) / lookups
+    finally:
+        table.destroy()
+
+    tracemalloc.start()
+    cache = TTLLRUCache(count, 3600)
+    expired = datetime.utcnow()
+    for i in range(count):
+        cache.set(short_text(i), RedirectEntry(i, URL % i, expired))
+    cache_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    started = perf_counter()
+    for key in keys:
+        cache.get(key)
+    cache_lookup = (perf_counter() - started) / lookups
+
+    per_million = 1e6 / count / 2 ** 20
+    print("links:                      %d" % count)
+    print("average short link and URL: %.1f bytes" % (url_bytes / count))
+    print("shared segment:             %.1f MiB (two halves)" % (
+        table.size / 2 ** 20
+    ))
+    print("shared per million links:   %.1f MiB for all workers" % (
+        table.size * per_million
+    ))
+    print("cache per million links:    %.1f MiB for every worker" % (
+        cache_bytes * per_million
+    ))
+    print("build of table:             %.2f s" % build)
+    print("lookup in table:            %.2f us" % (lookup * 1e6))
+    print("lookup in cache:            %.2f us" % (cache_lookup * 1e6))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--links", type=int, default=1000000)
+    parser.add_argument("--lookups", type=int, default=100000)
+    args = parser.parse_args()
+    run(args.links, args.lookups)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark of short codes generation.
+
+Run from project root:
+
+    python -m benchmarks.short_codes --count 100000
+
+Blocks are leased in memory, so database is not needed.
+"""
+import argparse
+from time import perf_counter
+
+from hashids import Hashids
+
+from models.link import short_code_seq
+from settings import (
+    SHORT_CODE_ALPHABET,
+    SHORT_CODE_BLOCK_SIZE,
+    SHORT_CODE_MIN_LENGTH,
+    SHORT_CODE_SALT,
+)
+from utils.short_codes import ShortCodeAllocator
+
+
+def legacy_short_url(long_url: str) -> str:
+    """Former get_short_url, new Hashids object for every link"""
+    return Hashids(long_url).encode(123456)
+
+
+def bench_legacy(count: int) -> float:
+    """Returns codes per second of former get_short_url"""
+    urls = ["http://example.com/%s" % i for i in range(count)]
+    started = perf_counter()
+    for url in urls:
+        legacy_short_url(url)
+    return count / (perf_counter() - started)
+
+
+def bench_allocator(count: int, block_size: int) -> float:
+    """Returns codes per second of allocator with in-memory leases"""
+    allocator = ShortCodeAllocator(
+        short_code_seq,
+        block_size=block_size,
+        salt=SHORT_CODE_SALT,
+        min_length=SHORT_CODE_MIN_LENGTH,
+        alphabet=SHORT_CODE_ALPHABET,
+    )
+    next_start = 1
+    started = perf_counter()
+    for _ in range(count):
+        numbers = allocator.take(1)
+        if not numbers:
+            allocator.add_block(next_start)
+            next_start += block_size
+            numbers = allocator.take(1)
+        allocator.encode(numbers[0])
+    return count / (perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--count", type=int, default=100000)
+    parser.add_argument("--block-size", type=int, default=SHORT_CODE_BLOCK_SIZE)
+    args = parser.parse_args()
+    print("legacy get_short_url: %.0f codes/s" % bench_legacy(args.count))
+    print("block allocator:      %.0f codes/s" % bench_allocator(
+        args.count, args.block_size
+    ))
+
+
+if __name__ == "__main__":
+    main()
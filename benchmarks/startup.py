@@ -0,0 +1,103 @@
+"""
+Benchmark of cold start of application.
+
+Run from project root:
+
+    python -m benchmarks.startup --runs 3 --max-import-ms 1000
+
+Measures import of main by python -X importtime and time from start
+of uvicorn process to the first 200 answer, which includes startup hooks.
+Exits with code 1 when limits are exceeded, so it can be run in CI.
+Database from settings is used.
+"""
+import argparse
+import socket
+import subprocess
+import sys
+from time import perf_counter, sleep
+from urllib.error import URLError
+from urllib.request import urlopen
+
+
+def measure_import(module: str):
+    """Returns total import time of module in ms and slowest modules"""
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import %s" % module],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules = []
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        own, total, name = line[len("import time:"):].split("|")
+        if not own.strip().isdigit():
+            continue
+        modules.append((int(own) / 1000, int(total) / 1000, name.strip()))
+    total_ms = next(total for _, total, name in modules if name == module)
+    return total_ms, sorted(modules, reverse=True)[:10]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_first_200(path: str, timeout: float) -> float:
+    """Returns ms from start of server to the first 200 answer"""
+    port = free_port()
+    started = perf_counter()
+    server = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "main:app",
+            "--port", str(port), "--log-level", "warning",
+        ],
+    )
+    try:
+        while perf_counter() - started < timeout:
+            try:
+                with urlopen("http://127.0.0.1:%s%s" % (port, path)) as response:
+                    if response.status == 200:
+                        return (perf_counter() - started) * 1000
+            except (URLError, ConnectionError):
+                sleep(0.01)
+        raise TimeoutError("Server did not answer in %s s" % timeout)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--path", default="/docs")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--max-import-ms", type=float)
+    parser.add_argument("--max-first-200-ms", type=float)
+    args = parser.parse_args()
+    imports = [measure_import("main") for _ in range(args.runs)]
+    import_ms, slowest = min(imports)
+    print("import main:     %.0f ms" % import_ms)
+    for own, total, name in slowest:
+        print("  %8.1f ms self %8.1f ms total  %s" % (own, total, name))
+    first_200_ms = min(
+        measure_first_200(args.path, args.timeout) for _ in range(args.runs)
+    )
+    print("first 200:       %.0f ms" % first_200_ms)
+    failed = False
+    if args.max_import_ms is not None and import_ms > args.max_import_ms:
+        print("import of main is slower than %s ms" % args.max_import_ms)
+        failed = True
+    if (
+        args.max_first_200_ms is not None
+        and first_200_ms > args.max_first_200_ms
+    ):
+        print("first 200 is slower than %s ms" % args.max_first_200_ms)
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
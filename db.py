@@ -1,11 +1,108 @@
-from sqlalchemy import create_engine
+import asyncio
+from typing import Dict
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from settings import (
+    DATABASE_URL,
+    ASYNC_DATABASE_URL,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE,
+    DB_POOL_PRE_PING,
+    DB_STATEMENT_TIMEOUT_MS,
+    DATABASE_REPLICA_URLS,
+    REPLICA_RETRY_SECONDS,
+    REPLICA_CHECK_TIMEOUT_SECONDS,
+    METRICS_ENABLED,
+)
+from utils.metrics import instrument_queries
+from utils.pool import PoolStats, instrument_engine, instrumented_pool_class
+from utils.replicas import ReplicaRouter
 
-from settings import DATABASE_URL
 
+pool_options = {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_timeout": DB_POOL_TIMEOUT,
+    "pool_recycle": DB_POOL_RECYCLE,
+    "pool_pre_ping": DB_POOL_PRE_PING,
+}
 
-engine = create_engine(DATABASE_URL)
+pool_stats = PoolStats()
+engine = create_engine(
+    DATABASE_URL,
+    poolclass=instrumented_pool_class(QueuePool, pool_stats),
+    connect_args={"options": "-c statement_timeout=%d" % DB_STATEMENT_TIMEOUT_MS},
+    **pool_options
+)
+instrument_engine(engine, pool_stats)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_connect_args = {
+    "server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}
+}
+async_pool_stats = PoolStats()
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    poolclass=instrumented_pool_class(AsyncAdaptedQueuePool, async_pool_stats),
+    connect_args=async_connect_args,
+    **pool_options
+)
+instrument_engine(async_engine.sync_engine, async_pool_stats)
+
+
+def create_replica_engine(url: str, stats: PoolStats) -> AsyncEngine:
+    """Creates engine of replica with pool measured like primary one"""
+    replica = create_async_engine(
+        url,
+        poolclass=instrumented_pool_class(AsyncAdaptedQueuePool, stats),
+        connect_args=async_connect_args,
+        **pool_options
+    )
+    instrument_engine(replica.sync_engine, stats)
+    return replica
+
+
+replica_pool_stats = [PoolStats() for _ in DATABASE_REPLICA_URLS]
+# stats of pools of async engines by name of pool
+async_pools_stats: Dict[str, PoolStats] = dict(
+    primary=async_pool_stats,
+    **{"replica%d" % number: stats for number, stats in enumerate(replica_pool_stats)}
+)
+replica_router = ReplicaRouter(
+    async_engine,
+    [
+        create_replica_engine(url, stats)
+        for url, stats in zip(DATABASE_REPLICA_URLS, replica_pool_stats)
+    ],
+    retry_seconds=REPLICA_RETRY_SECONDS,
+    check_timeout=REPLICA_CHECK_TIMEOUT_SECONDS,
+)
+if METRICS_ENABLED:
+    instrument_queries(engine)
+    instrument_queries(async_engine.sync_engine)
+    for replica in replica_router.replicas:
+        instrument_queries(replica.sync_engine)
+AsyncSessionLocal = sessionmaker(
+    async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
 Base = declarative_base()
+
+
+async def warm_up_pool(engine: AsyncEngine, connections: int) -> None:
+    """Opens connections of pool before the first request"""
+    async def ping():
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    await asyncio.gather(*(ping() for _ in range(connections)))
@@ -0,0 +1,68 @@
+"""
+Configuration of gunicorn for production:
+
+    gunicorn -c gunicorn.conf.py main:app
+"""
+import os
+
+
+bind = "%s:%s" % (
+    os.environ.get("BIND_HOST", "0.0.0.0"), os.environ.get("PORT", "80")
+)
+worker_class = "uvicorn.workers.UvicornWorker"
+# async workers, so one worker per core is enough
+workers = int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1))
+# application is imported once in master and workers are forked from it
+preload_app = True
+# restart of workers limits leaks, jitter spreads restarts in time
+max_requests = int(os.environ.get("MAX_REQUESTS", 10000))
+max_requests_jitter = int(os.environ.get("MAX_REQUESTS_JITTER", 1000))
+timeout = int(os.environ.get("WORKER_TIMEOUT", 60))
+graceful_timeout = int(os.environ.get("GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.environ.get("KEEPALIVE", 5))
+accesslog = os.environ.get("ACCESS_LOG", "-") or None
+errorlog = "-"
+
+
+def post_fork(server, worker):
+    """Worker gets own connections, caches and threads"""
+    from main import reset_worker_state
+
+    reset_worker_state()
+
+
+def when_ready(server):
+    """Starts the only loader of shared redirect table of the host"""
+    from multiprocessing import Process
+
+    from settings import SHARED_TABLE
+
+    if SHARED_TABLE:
+        server.table_loader = Process(
+            target=_run_table_loader, name="table_loader", daemon=True
+        )
+        server.table_loader.start()
+
+
+def on_exit(server):
+    """Stops loader and removes shared redirect table"""
+    loader = getattr(server, "table_loader", None)
+    if loader is not None:
+        from utils.links import redirect_table
+
+        loader.terminate()
+        loader.join(5)
+        redirect_table.destroy()
+
+
+def _run_table_loader():
+    import signal
+
+    from main import reset_worker_state
+    import table_loader
+
+    # handlers of master only wake up master, loader must stop by signals
+    for name in ("SIGTERM", "SIGINT", "SIGQUIT", "SIGHUP", "SIGCHLD", "SIGWINCH"):
+        signal.signal(getattr(signal, name), signal.SIG_DFL)
+    reset_worker_state()
+    table_loader.main()
@@ -1,18 +1,70 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi_utils.tasks import repeat_every
 
 from routers.links import router as link_router
 from routers.users import router as user_router
+from routers.stats import router as stats_router
+from routers.metrics import router as metrics_router
 
-from db import Base, engine
-from settings import TIME_CHECK_EXPIRED_LINKS_SECONDS
-from utils.links import remove_expired_links
+from db import Base, engine, async_engine, replica_router, warm_up_pool
+from settings import (
+    TIME_CHECK_EXPIRED_LINKS_SECONDS,
+    CLICKS_FLUSH_SECONDS,
+    REPLICA_RETRY_SECONDS,
+    FAST_REDIRECT,
+    BLOOM_FILTER,
+    BLOOM_REBUILD_SECONDS,
+    CREATE_SCHEMA,
+    DB_POOL_WARM_CONNECTIONS,
+    METRICS_ENABLED,
+    GZIP_MINIMUM_SIZE,
+    GZIP_LEVEL,
+)
+from utils.clicks import click_aggregator
+from utils.links import (
+    remove_expired_links,
+    load_short_code_filter,
+    redirect_cache,
+    redirect_table,
+    shared_cache,
+    short_codes,
+    start_invalidation_listener,
+)
+from utils.metrics import MetricsMiddleware, track_task
+from utils.redirects import FastRedirectMiddleware
+from utils.users import hashing_executor, user_cache, warm_up_auth
 import models  # noqa
 
-Base.metadata.create_all(bind=engine)
+
+def reset_worker_state() -> None:
+    """
+    Drops state inherited from master process after fork.
+    Connections of pools are left to master, worker opens own ones.
+    """
+    engines = [engine, async_engine.sync_engine] + [
+        replica.sync_engine for replica in replica_router.replicas
+    ]
+    for db_engine in engines:
+        db_engine.dispose(close=False)
+    redirect_cache.clear()
+    shared_cache.reset()
+    redirect_table.reset()
+    user_cache.clear()
+    short_codes.reset()
+    hashing_executor.shutdown()
+
 
 app = FastAPI(title="REST API using FastAPI PostgreSQL Async EndPoints")
+if GZIP_MINIMUM_SIZE:
+    # the innermost one, so redirects by fast path skip it
+    app.add_middleware(
+        GZipMiddleware, minimum_size=GZIP_MINIMUM_SIZE, compresslevel=GZIP_LEVEL
+    )
+if FAST_REDIRECT:
+    # added first to work inside of CORS middleware
+    app.add_middleware(FastRedirectMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -20,14 +72,66 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+if METRICS_ENABLED:
+    # the outermost one, so it measures all other middlewares
+    app.add_middleware(MetricsMiddleware)
 
 
+if METRICS_ENABLED:
+    # before /{short_text} route of links
+    app.include_router(metrics_router)
 app.include_router(link_router)
 app.include_router(user_router)
+app.include_router(stats_router)
+
+
+# Runs before periodic tasks which need tables
+@app.on_event("startup")
+async def prepare_application() -> None:
+    if CREATE_SCHEMA:
+        async with async_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    await warm_up_pool(async_engine, DB_POOL_WARM_CONNECTIONS)
+    warm_up_auth()
+    start_invalidation_listener()
 
 
 # Periodic task for delete links with date expired
 @app.on_event("startup")
 @repeat_every(seconds=TIME_CHECK_EXPIRED_LINKS_SECONDS)
-def remove_expired_links_task() -> None:
-    remove_expired_links()
+@track_task("remove_expired_links")
+async def remove_expired_links_task() -> None:
+    await remove_expired_links()
+
+
+# Periodic task for write collected clicks to database
+@app.on_event("startup")
+@repeat_every(seconds=CLICKS_FLUSH_SECONDS, wait_first=True)
+@track_task("flush_clicks")
+async def flush_clicks_task() -> None:
+    await click_aggregator.flush()
+
+
+# Periodic task for return recovered replicas of database
+@app.on_event("startup")
+@repeat_every(seconds=REPLICA_RETRY_SECONDS)
+@track_task("check_replicas")
+async def check_replicas_task() -> None:
+    await replica_router.check_health()
+
+
+# Periodic task for rebuild filter of existing short links
+@app.on_event("startup")
+@repeat_every(seconds=BLOOM_REBUILD_SECONDS)
+@track_task("load_short_code_filter")
+async def load_short_code_filter_task() -> None:
+    if BLOOM_FILTER:
+        await load_short_code_filter()
+
+
+@app.on_event("shutdown")
+async def close_db_connections() -> None:
+    await click_aggregator.flush()
+    shared_cache.close()
+    await async_engine.dispose()
+    await replica_router.dispose()
@@ -0,0 +1,44 @@
+"""links text digest
+
+Revision ID: 3ed3aa82c9e1
+Revises: d28a772d6fe5
+Create Date: 2026-10-18 11:02:17.604381
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3ed3aa82c9e1'
+down_revision = 'd28a772d6fe5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        'Links', sa.Column('text_digest', sa.LargeBinary(32), nullable=True)
+    )
+    # Only the oldest of links with the same text gets digest,
+    # duplicates stay with NULL which is allowed by unique index.
+    op.execute(
+        """
+        UPDATE "Links" SET text_digest = sha256(convert_to(text, 'UTF8'))
+        WHERE id IN (
+            SELECT min(id) FROM "Links"
+            WHERE text IS NOT NULL
+            GROUP BY text
+        )
+        """
+    )
+    op.drop_index('ix_Links_text', table_name='Links')
+    op.create_index(
+        op.f('ix_Links_text_digest'), 'Links', ['text_digest'], unique=True
+    )
+
+
+def downgrade():
+    op.drop_index(op.f('ix_Links_text_digest'), table_name='Links')
+    op.create_index(op.f('ix_Links_text'), 'Links', ['text'], unique=False)
+    op.drop_column('Links', 'text_digest')
@@ -0,0 +1,25 @@
+"""links owner id index
+
+Revision ID: 5104e5640523
+Revises: 3ed3aa82c9e1
+Create Date: 2026-10-18 11:48:05.917262
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '5104e5640523'
+down_revision = '3ed3aa82c9e1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        'ix_Links_owner_id_id', 'Links', ['owner_id', 'id'], unique=False
+    )
+
+
+def downgrade():
+    op.drop_index('ix_Links_owner_id_id', table_name='Links')
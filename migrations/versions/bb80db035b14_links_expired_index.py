@@ -0,0 +1,23 @@
+"""links expired index
+
+Revision ID: bb80db035b14
+Revises: 5104e5640523
+Create Date: 2026-10-18 12:31:52.140275
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'bb80db035b14'
+down_revision = '5104e5640523'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(op.f('ix_Links_expired'), 'Links', ['expired'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_Links_expired'), table_name='Links')
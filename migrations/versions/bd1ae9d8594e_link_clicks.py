@@ -0,0 +1,30 @@
+"""link clicks
+
+Revision ID: bd1ae9d8594e
+Revises: bb80db035b14
+Create Date: 2026-10-18 13:20:44.662017
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'bd1ae9d8594e'
+down_revision = 'bb80db035b14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('link_clicks',
+    sa.Column('link_id', sa.Integer(), nullable=False),
+    sa.Column('bucket', sa.DateTime(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['link_id'], ['Links.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('link_id', 'bucket')
+    )
+
+
+def downgrade():
+    op.drop_table('link_clicks')
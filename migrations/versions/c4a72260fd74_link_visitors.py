@@ -0,0 +1,30 @@
+"""link visitors
+
+Revision ID: c4a72260fd74
+Revises: bd1ae9d8594e
+Create Date: 2026-10-18 14:05:13.287105
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4a72260fd74'
+down_revision = 'bd1ae9d8594e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('link_visitors',
+    sa.Column('link_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('sketch', sa.LargeBinary(), nullable=False),
+    sa.ForeignKeyConstraint(['link_id'], ['Links.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('link_id', 'day')
+    )
+
+
+def downgrade():
+    op.drop_table('link_visitors')
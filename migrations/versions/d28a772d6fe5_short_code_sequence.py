@@ -0,0 +1,86 @@
+"""short code sequence
+
+Revision ID: d28a772d6fe5
+Revises: 9c012cc8dfc2
+Create Date: 2026-10-18 10:12:41.318054
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.schema import CreateSequence, DropSequence
+
+from settings import (
+    SHORT_CODE_ALPHABET,
+    SHORT_CODE_BLOCK_SIZE,
+    SHORT_CODE_MIN_LENGTH,
+    SHORT_CODE_SALT,
+)
+from utils.short_codes import ShortCodeAllocator
+
+
+# revision identifiers, used by Alembic.
+revision = 'd28a772d6fe5'
+down_revision = '9c012cc8dfc2'
+branch_labels = None
+depends_on = None
+
+
+short_code_seq = sa.Sequence(
+    'Links_short_code_seq', start=1, increment=SHORT_CODE_BLOCK_SIZE
+)
+links = sa.table(
+    'Links',
+    sa.column('id', sa.Integer),
+    sa.column('short_text', sa.String),
+)
+
+
+def upgrade():
+    op.execute(CreateSequence(short_code_seq))
+    # Old short links were not unique, give new codes to duplicates
+    # and keep the code of the oldest link.
+    conn = op.get_bind()
+    ranked = sa.select(
+        links.c.id,
+        sa.func.row_number().over(
+            partition_by=links.c.short_text, order_by=links.c.id
+        ).label('rank'),
+        links.c.short_text,
+    ).subquery()
+    duplicate_ids = conn.execute(
+        sa.select(ranked.c.id).where(
+            sa.or_(ranked.c.rank > 1, ranked.c.short_text.is_(None))
+        )
+    ).scalars().all()
+    allocator = ShortCodeAllocator(
+        short_code_seq,
+        block_size=SHORT_CODE_BLOCK_SIZE,
+        salt=SHORT_CODE_SALT,
+        min_length=SHORT_CODE_MIN_LENGTH,
+        alphabet=SHORT_CODE_ALPHABET,
+    )
+    for link_id in duplicate_ids:
+        while True:
+            short_text = allocator.allocate_sync(conn)[0]
+            taken = conn.execute(
+                sa.select(links.c.id).where(links.c.short_text == short_text)
+            ).first()
+            if not taken:
+                break
+        conn.execute(
+            links.update()
+            .where(links.c.id == link_id)
+            .values(short_text=short_text)
+        )
+    op.drop_index('ix_Links_short_text', table_name='Links')
+    op.create_index(
+        op.f('ix_Links_short_text'), 'Links', ['short_text'], unique=True
+    )
+
+
+def downgrade():
+    op.drop_index(op.f('ix_Links_short_text'), table_name='Links')
+    op.create_index(
+        op.f('ix_Links_short_text'), 'Links', ['short_text'], unique=False
+    )
+    op.execute(DropSequence(short_code_seq))
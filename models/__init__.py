@@ -1,2 +1,4 @@
 from .user import User
-from .link import Link
\ No newline at end of file
+from .link import Link
+from .click import LinkClick
+from .visitor import LinkVisitors
\ No newline at end of file
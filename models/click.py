@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, ForeignKey, DateTime
+
+from db import Base
+from .link import Link
+
+
+class LinkClick(Base):
+    """Model clicks of link per minute in database"""
+    __tablename__ = "link_clicks"
+
+    link_id = Column(
+        ForeignKey(Link.id, ondelete="CASCADE"), primary_key=True
+    )
+    bucket = Column(DateTime(), primary_key=True)
+    count = Column(Integer(), nullable=False, default=0)
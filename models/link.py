@@ -1,15 +1,44 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from hashlib import sha256
+
+from sqlalchemy import (
+    Column, Integer, String, ForeignKey, DateTime, Sequence, LargeBinary, Index
+)
 
 from db import Base
+from settings import SHORT_CODE_BLOCK_SIZE
 from .user import User
 
 
+short_code_seq = Sequence(
+    "Links_short_code_seq",
+    start=1,
+    increment=SHORT_CODE_BLOCK_SIZE,
+    metadata=Base.metadata,
+)
+
+
+def get_text_digest(text: str) -> bytes:
+    """Gets fixed-width digest of long link for unique index"""
+    return sha256(text.encode()).digest()
+
+
+def _default_text_digest(context) -> bytes:
+    return get_text_digest(context.get_current_parameters()["text"])
+
+
 class Link(Base):
     """Model Link object in database"""
     __tablename__ = "Links"
 
     id = Column(Integer, primary_key=True, index=True)
-    expired = Column(DateTime())
-    text = Column(String(), index=True)
-    short_text = Column(String(), index=True)
+    expired = Column(DateTime(), index=True)
+    text = Column(String())
+    text_digest = Column(
+        LargeBinary(32), index=True, unique=True, default=_default_text_digest
+    )
+    short_text = Column(String(), index=True, unique=True)
     owner_id = Column(ForeignKey(User.id, ondelete="CASCADE"))
+
+    __table_args__ = (
+        Index("ix_Links_owner_id_id", "owner_id", "id"),
+    )
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Date, ForeignKey, LargeBinary
+
+from db import Base
+from .link import Link
+
+
+class LinkVisitors(Base):
+    """Model HyperLogLog sketch of unique visitors of link per day"""
+    __tablename__ = "link_visitors"
+
+    link_id = Column(
+        ForeignKey(Link.id, ondelete="CASCADE"), primary_key=True
+    )
+    day = Column(Date(), primary_key=True)
+    sketch = Column(LargeBinary(), nullable=False)
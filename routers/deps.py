@@ -1,66 +1,86 @@
-from typing import Generator
+from typing import AsyncGenerator
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import jwt
 from pydantic import ValidationError
-from sqlalchemy.orm import Session
+from sqlalchemy import exc, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from db import SessionLocal
-from schemas.user import TokenData
+from db import AsyncSessionLocal, replica_router
+from schemas.user import User
 from models.user import User as UserModel
-from settings import (
-    SECRET_KEY,
-    ALGORITHM
-)
+from utils.users import cache_user, get_token_data, user_cache
 
 
 reusable_oauth2 = OAuth2PasswordBearer(tokenUrl="/api/token")
 
 
-def get_db() -> Generator:
+async def get_db() -> AsyncGenerator:
     """Gets session for work with database"""
-    try:
-        db = SessionLocal()
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 
-def get_current_user(
-    db: Session = Depends(get_db),
+async def get_read_db() -> AsyncGenerator:
+    """
+    Gets session for read-only queries.
+    It works with replica of database when replicas are configured.
+    """
+    engine = replica_router.get_engine()
+    async with AsyncSessionLocal(bind=engine) as db:
+        try:
+            yield db
+        except (exc.OperationalError, exc.InterfaceError, OSError):
+            # replica is not reachable, other ones are used for a while
+            replica_router.mark_unhealthy(engine)
+            raise
+
+
+async def get_current_user(
+    db: AsyncSession = Depends(get_db),
     token: str = Depends(reusable_oauth2)
-) -> UserModel:
+) -> User:
     """Gets current user by token"""
     try:
-        payload = jwt.decode(
-            token, SECRET_KEY, algorithms=[ALGORITHM]
-        )
-        token_data = TokenData(**payload)
-    except (jwt.JWTError, ValidationError):
+        token_data = get_token_data(token)
+    except (ValueError, ValidationError):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Could not validate credentials",
         )
-    user = db.query(UserModel).filter(
-        UserModel.username == token_data.sub
-    ).first()
-    if not user:
+    if token_data.id is not None:
+        user = user_cache.get(token_data.id)
+        if user is not None and (
+            user.is_active != token_data.is_active
+            or user.is_admin != token_data.is_admin
+        ):
+            # claims are stale or cache is stale, database decides
+            user = None
+        if user is not None:
+            return user
+        db_user = await db.get(UserModel, token_data.id)
+    else:
+        # tokens issued before claims were added
+        result = await db.execute(
+            select(UserModel).filter(UserModel.username == token_data.sub)
+        )
+        db_user = result.scalars().first()
+    if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
-    return user
+    return cache_user(db_user)
 
 
-def get_current_active_user(
-    current_user: UserModel = Depends(get_current_user),
-) -> UserModel:
+async def get_current_active_user(
+    current_user: User = Depends(get_current_user),
+) -> User:
     """Checks is current user active"""
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
 
-def get_current_active_superuser(
-    current_user: UserModel = Depends(get_current_user),
-) -> UserModel:
+async def get_current_active_superuser(
+    current_user: User = Depends(get_current_user),
+) -> User:
     """Checks is current user is admin"""
     if not current_user.is_admin:
         raise HTTPException(
@@ -1,108 +1,252 @@
-from datetime import datetime, timedelta
-from typing import Any, List
+from datetime import datetime, timedelta, timezone
+from typing import Any, List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import RedirectResponse
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import RedirectResponse, StreamingResponse
+from sqlalchemy import func, literal_column, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from schemas.link import LinkIn, Link, LinkUpdate
+from schemas.link import LinkIn, Link, LinkUpdate, LinkStats
 from schemas.user import User
-from models.link import Link as LinkModel
-from utils.links import get_short_url
-from settings import SHORT_LINK_EXPIRE_DAYS
+from models.click import LinkClick
+from models.link import Link as LinkModel, get_text_digest
+from models.visitor import LinkVisitors
+from utils.links import (
+    get_short_url,
+    redirect_cache,
+    cache_redirect,
+    upsert_links,
+    short_codes,
+    encode_cursor,
+    decode_cursor,
+    remember_short_text,
+    is_unknown_short_text,
+    rows_to_dicts,
+    get_shared_redirect,
+    get_table_redirect,
+    share_redirect,
+    invalidate_redirects,
+    LINK_COLUMNS,
+)
+from utils.responses import FastJSONResponse
+from utils.clicks import click_aggregator, count_visitors, visitor_key
+from utils.export import EXPORT_COLUMNS, export_rows
+from settings import (
+    SHORT_LINK_EXPIRE_DAYS,
+    SHORT_CODE_ATTEMPTS,
+    LINKS_BATCH_MAX_SIZE,
+    EXPORT_CHUNK_SIZE,
+)
 
-from .deps import get_db, get_current_user
+from .deps import get_db, get_read_db, get_current_user
 
 
 router = APIRouter()
 
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def to_naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Converts time with timezone to naive UTC time of database"""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def get_visitor(request: Request) -> bytes:
+    """Gets identity of visitor from client address and User-Agent"""
+    host = request.client.host if request.client else ""
+    user_agent = request.headers.get("user-agent", "")
+    return visitor_key(host, user_agent)
+
 
 @router.get("/{short_text}")
-def redirect_to_long_url(
+async def redirect_to_long_url(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
+    primary_db: AsyncSession = Depends(get_db),
     short_text: str,
+    request: Request,
 ) -> Any:
     """
     Gets link by short url and redirects to long url
     """
-    link = db.query(LinkModel).filter(
-        LinkModel.short_text == short_text
-    ).first()
-    if not link:
-        raise HTTPException(status_code=404, detail="Link not found")
-    return RedirectResponse(link.text)
+    entry = redirect_cache.get(short_text) or get_table_redirect(short_text)
+    if entry is None:
+        if is_unknown_short_text(short_text):
+            raise HTTPException(status_code=404, detail="Link not found")
+        entry = await get_shared_redirect(short_text)
+    if entry is None:
+        statement = select(LinkModel).filter(LinkModel.short_text == short_text)
+        link = (await db.execute(statement)).scalars().first()
+        if not link and db.bind is not primary_db.bind:
+            # replica may not have link created moments ago
+            link = (await primary_db.execute(statement)).scalars().first()
+        if not link:
+            raise HTTPException(status_code=404, detail="Link not found")
+        entry = cache_redirect(link)
+        await share_redirect(short_text, entry)
+    click_aggregator.record(entry.id, get_visitor(request))
+    return RedirectResponse(entry.text)
 
 
 @router.get("/api/links", response_model=List[Link])
 async def read_links(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    after: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
 ) -> Any:
     """
-    Retrieve links.
-    Admin can get all links. Other users can get only own links
+    Retrieve links ordered by id.
+    Admin can get all links. Other users can get only own links.
+    Header X-Next-Cursor holds value of "after" for the next page.
+    Rows are serialized to JSON without ORM objects and validation.
     """
-    if current_user.is_admin:
-        links = (
-            db.query(LinkModel)
-            .offset(skip)
-            .limit(limit)
-            .all()
-        )
-    else:
-        links = (
-            db.query(LinkModel)
-            .filter(LinkModel.owner_id == current_user.id)
-            .offset(skip)
-            .limit(limit)
-            .all()
-        )
+    statement = select(*LINK_COLUMNS).order_by(LinkModel.id)
+    if not current_user.is_admin:
+        statement = statement.filter(LinkModel.owner_id == current_user.id)
+    if after is not None:
+        try:
+            last_id = decode_cursor(after)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        statement = statement.filter(LinkModel.id > last_id)
+    result = await db.execute(statement.offset(skip).limit(limit))
+    links = rows_to_dicts(result)
+    response = FastJSONResponse(links)
+    if links and len(links) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(links[-1]["id"])
+    return response
 
-    return links
+
+@router.get("/api/links/export")
+async def export_links(
+    export_format: str = Query("ndjson", alias="format", regex="^(ndjson|csv)$"),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
+) -> Any:
+    """
+    Export links as NDJSON or CSV.
+    Admin can export all links. Other users can export only own links.
+    Rows are streamed from server-side cursor.
+    """
+    statement = select(
+        *(getattr(LinkModel, column) for column in EXPORT_COLUMNS)
+    ).order_by(LinkModel.id)
+    if not current_user.is_admin:
+        statement = statement.filter(LinkModel.owner_id == current_user.id)
+    result = await db.stream(
+        statement.execution_options(yield_per=EXPORT_CHUNK_SIZE)
+    )
+    return StreamingResponse(
+        export_rows(result.partitions(), export_format),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+    )
 
 
 @router.post("/api/links", response_model=Link)
 async def create_link(
     *,
     item_in: LinkIn,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ) -> Any:
     """
     Test if link with text exists then return one.
     Create new link if not found.
     """
-    link = db.query(LinkModel).filter(LinkModel.text == item_in.text).first()
-    if link:
-        return Link(
-            id=link.id,
-            text=link.text,
-            short_text=link.short_text,
-            expired=link.expired,
-            owner_id=link.owner_id
+    for _ in range(SHORT_CODE_ATTEMPTS):
+        statement = upsert_links([{
+            "text": item_in.text,
+            "text_digest": get_text_digest(item_in.text),
+            "short_text": await get_short_url(db),
+            "expired": datetime.utcnow() + timedelta(
+                days=SHORT_LINK_EXPIRE_DAYS
+            ),
+            "owner_id": current_user.id,
+        }])
+        try:
+            result = await db.execute(statement)
+            link = result.mappings().one()
+            await db.commit()
+        except IntegrityError:
+            # generated code is already taken by custom short link
+            await db.rollback()
+            continue
+        remember_short_text(link["short_text"])
+        return FastJSONResponse(dict(link))
+    raise HTTPException(status_code=409, detail="Could not create short link")
+
+
+@router.post("/api/links/batch", response_model=List[Link])
+async def create_links_batch(
+    *,
+    items_in: List[LinkIn],
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+) -> Any:
+    """
+    Create many links at once.
+    Existing links are found by one query and new ones are inserted
+    by one statement. Links are returned in order of request.
+    """
+    if len(items_in) > LINKS_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail="Too many links, maximum is %s" % LINKS_BATCH_MAX_SIZE
         )
-    short_text = get_short_url(item_in.text)
-    db_obj = LinkModel(
-        text=item_in.text,
-        short_text=short_text,
-        expired=datetime.utcnow() + timedelta(
-            days=SHORT_LINK_EXPIRE_DAYS
-        ),
-        owner_id=current_user.id
+    digests = {}
+    for item_in in items_in:
+        digests.setdefault(item_in.text, get_text_digest(item_in.text))
+    result = await db.execute(
+        select(LinkModel).filter(LinkModel.text_digest.in_(digests.values()))
     )
-    db.add(db_obj)
-    db.commit()
-    db.refresh(db_obj)
-    return db_obj
+    links = {
+        link.text: Link.from_orm(link) for link in result.scalars().all()
+    }
+    new_texts = [text for text in digests if text not in links]
+    for _ in range(SHORT_CODE_ATTEMPTS):
+        if not new_texts:
+            break
+        expired = datetime.utcnow() + timedelta(days=SHORT_LINK_EXPIRE_DAYS)
+        short_texts = await short_codes.allocate(db, len(new_texts))
+        statement = upsert_links([
+            {
+                "text": text,
+                "text_digest": digests[text],
+                "short_text": short_text,
+                "expired": expired,
+                "owner_id": current_user.id,
+            }
+            for text, short_text in zip(new_texts, short_texts)
+        ])
+        try:
+            result = await db.execute(statement)
+            rows = result.mappings().all()
+            await db.commit()
+        except IntegrityError:
+            # generated code is already taken by custom short link
+            await db.rollback()
+            continue
+        for row in rows:
+            remember_short_text(row["short_text"])
+            links[row["text"]] = Link(**row)
+        new_texts = []
+    if new_texts:
+        raise HTTPException(status_code=409, detail="Could not create short links")
+    return [links[item_in.text] for item_in in items_in]
 
 
 @router.put("/api/link/{id}", response_model=Link)
-def update_link(
+async def update_link(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     id: int,
     item_in: LinkUpdate,
     current_user: User = Depends(get_current_user),
@@ -111,24 +255,30 @@ def update_link(
     Update a link.
     Admin cat edit any links. Usual user can edit only own links.
     """
-    db_obj = db.query(LinkModel).get(id)
+    db_obj = await db.get(LinkModel, id)
     if not db_obj:
         raise HTTPException(status_code=404, detail="Link not found")
     if not current_user.is_admin and (db_obj.owner_id != current_user.id):
         raise HTTPException(status_code=400, detail="Not enough permissions")
+    old_short_text = db_obj.short_text
     hero_data = item_in.dict(exclude_unset=True)
     for key, value in hero_data.items():
         setattr(db_obj, key, value)
     db.add(db_obj)
-    db.commit()
-    db.refresh(db_obj)
+    try:
+        await db.commit()
+    except IntegrityError:
+        raise HTTPException(status_code=400, detail="Short link already exists")
+    await db.refresh(db_obj)
+    remember_short_text(db_obj.short_text)
+    await invalidate_redirects(old_short_text, db_obj.short_text)
     return db_obj
 
 
 @router.get("/api/link/{id}", response_model=Link)
-def read_link(
+async def read_link(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     id: int,
     current_user: User = Depends(get_current_user),
 ) -> Any:
@@ -136,24 +286,77 @@ def read_link(
     Get link by ID.
     Admin get get any link. Regular user cat get only own link.
     """
-    db_obj = db.query(LinkModel).get(id)
+    result = await db.execute(
+        select(*LINK_COLUMNS).filter(LinkModel.id == id)
+    )
+    link = result.mappings().first()
+    if not link:
+        raise HTTPException(status_code=404, detail="Link not found")
+    if not current_user.is_admin and (link["owner_id"] != current_user.id):
+        raise HTTPException(status_code=400, detail="Not enough permissions")
+    return FastJSONResponse(dict(link))
+
+
+@router.get("/api/link/{id}/stats", response_model=LinkStats)
+async def read_link_stats(
+    *,
+    db: AsyncSession = Depends(get_read_db),
+    id: int,
+    granularity: str = Query("hour", regex="^(hour|day)$"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    current_user: User = Depends(get_current_user),
+) -> Any:
+    """
+    Get clicks of link by hours or days and approximate number
+    of unique visitors in days of period.
+    By default returns statistics for the last week.
+    Admin get get stats of any link. Regular user cat get only own link.
+    """
+    db_obj = await db.get(LinkModel, id)
     if not db_obj:
         raise HTTPException(status_code=404, detail="Link not found")
     if not current_user.is_admin and (db_obj.owner_id != current_user.id):
         raise HTTPException(status_code=400, detail="Not enough permissions")
-    return Link(
-        id=db_obj.id,
-        text=db_obj.text,
-        short_text=db_obj.short_text,
-        expired=db_obj.expired,
-        owner_id=db_obj.owner_id
+    end = to_naive_utc(end) or datetime.utcnow()
+    start = to_naive_utc(start) or end - timedelta(days=7)
+    # literal keeps the same expression in SELECT and GROUP BY
+    period = func.date_trunc(
+        literal_column("'%s'" % granularity), LinkClick.bucket
+    ).label("period")
+    result = await db.execute(
+        select(period, func.sum(LinkClick.count).label("clicks"))
+        .filter(
+            LinkClick.link_id == id,
+            LinkClick.bucket >= start,
+            LinkClick.bucket < end,
+        )
+        .group_by(period)
+        .order_by(period)
+    )
+    series = result.mappings().all()
+    result = await db.execute(
+        select(LinkVisitors.sketch).filter(
+            LinkVisitors.link_id == id,
+            LinkVisitors.day >= start.date(),
+            LinkVisitors.day <= end.date(),
+        )
+    )
+    return LinkStats(
+        link_id=id,
+        granularity=granularity,
+        start=start,
+        end=end,
+        clicks=sum(point["clicks"] for point in series),
+        unique_visitors=count_visitors(result.scalars()),
+        series=series,
     )
 
 
 @router.delete("/api/link/{id}")
-def delete_link(
+async def delete_link(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     id: int,
     current_user: User = Depends(get_current_user),
 ) -> Any:
@@ -161,11 +364,12 @@ def delete_link(
     Delete an link.
     Admin can delete any links. Other users ca delete only their own links
     """
-    db_obj = db.query(LinkModel).get(id)
+    db_obj = await db.get(LinkModel, id)
     if not db_obj:
         raise HTTPException(status_code=404, detail="Link not found")
     if not current_user.is_admin and (db_obj.owner_id != current_user.id):
         raise HTTPException(status_code=400, detail="Not enough permissions")
-    db.delete(db_obj)
-    db.commit()
+    await db.delete(db_obj)
+    await db.commit()
+    await invalidate_redirects(db_obj.short_text)
     return {"deleted": True}
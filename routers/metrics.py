@@ -0,0 +1,106 @@
+from typing import Any
+
+from fastapi import APIRouter
+from fastapi.responses import Response
+
+from db import async_pools_stats
+from utils.clicks import click_aggregator
+from utils.links import (
+    redirect_cache,
+    redirect_table,
+    shared_cache,
+    short_code_filter,
+    sweeper_stats,
+)
+from utils.metrics import CONTENT_TYPE, Counter, Gauge, registry
+from utils.users import token_cache, user_cache
+
+
+router = APIRouter()
+
+cache_entries = registry.register(Gauge(
+    "cache_entries", "Entries in cache.", ("cache",)
+))
+cache_hits = registry.register(Counter(
+    "cache_hits_total", "Hits of cache.", ("cache",)
+))
+cache_misses = registry.register(Counter(
+    "cache_misses_total", "Misses of cache.", ("cache",)
+))
+cache_evictions = registry.register(Counter(
+    "cache_evictions_total", "Entries evicted from full cache.", ("cache",)
+))
+shared_cache_errors = registry.register(Counter(
+    "shared_cache_errors_total", "Failures of shared cache."
+))
+pool_connections = registry.register(Gauge(
+    "db_pool_connections", "Connections of pool by state.", ("pool", "state")
+))
+pool_checkouts = registry.register(Counter(
+    "db_pool_checkouts_total", "Checkouts of connections from pool.", ("pool",)
+))
+pool_timeouts = registry.register(Counter(
+    "db_pool_timeouts_total",
+    "Checkouts which waited for connection too long.",
+    ("pool",),
+))
+pool_wait = registry.register(Counter(
+    "db_pool_wait_seconds_total", "Time of waiting for connections.", ("pool",)
+))
+sweeper_removed = registry.register(Counter(
+    "sweeper_removed_links_total", "Expired links removed by this process."
+))
+sweeper_skipped = registry.register(Counter(
+    "sweeper_skipped_total", "Sweeps skipped because other process holds lock."
+))
+clicks_pending = registry.register(Gauge(
+    "clicks_pending", "Clicks which are not written to database yet."
+))
+table_entries = registry.register(Gauge(
+    "shared_table_entries", "Links in shared memory table of host."
+))
+filter_entries = registry.register(Gauge(
+    "short_code_filter_entries", "Short links in filter of existing ones."
+))
+
+
+@registry.on_collect
+def collect_stats() -> None:
+    """Copies stats of caches, pool and background tasks to metrics"""
+    for name, cache in (
+        ("redirect", redirect_cache),
+        ("user", user_cache),
+        ("token", token_cache),
+    ):
+        stats = cache.stats()
+        cache_entries.set(stats["size"], name)
+        cache_hits.set(stats["hits"], name)
+        cache_misses.set(stats["misses"], name)
+        cache_evictions.set(stats["evictions"], name)
+    shared = shared_cache.stats()
+    cache_hits.set(shared["hits"], "shared")
+    cache_misses.set(shared["misses"], "shared")
+    shared_cache_errors.set(shared["errors"])
+    table = redirect_table.stats()
+    cache_hits.set(table["hits"], "table")
+    cache_misses.set(table["misses"], "table")
+    table_entries.set(table["count"])
+    for name, stats in async_pools_stats.items():
+        pool = stats.snapshot()
+        for state in ("in_use", "idle", "overflow"):
+            pool_connections.set(pool[state], name, state)
+        pool_checkouts.set(pool["checkouts"], name)
+        pool_timeouts.set(pool["timeouts"], name)
+        pool_wait.set(pool["wait_seconds"], name)
+    sweeper_removed.set(sweeper_stats["removed"])
+    sweeper_skipped.set(sweeper_stats["skipped"])
+    clicks_pending.set(click_aggregator.pending)
+    filter_entries.set(short_code_filter.stats()["count"] or 0)
+
+
+@router.get("/metrics", include_in_schema=False)
+async def read_metrics() -> Any:
+    """
+    Get metrics of this process in Prometheus text format.
+    """
+    return Response(registry.render(), media_type=CONTENT_TYPE)
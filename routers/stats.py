@@ -0,0 +1,71 @@
+from typing import Any
+
+from fastapi import APIRouter, Depends
+
+from db import async_pool_stats, replica_pool_stats
+from schemas.user import User
+from utils.links import (
+    redirect_cache,
+    redirect_table,
+    shared_cache,
+    short_code_filter,
+    sweeper_stats,
+)
+
+from .deps import get_current_active_superuser
+
+
+router = APIRouter()
+
+
+@router.get("/api/stats/cache")
+async def read_cache_stats(
+    current_user: User = Depends(get_current_active_superuser),
+) -> Any:
+    """
+    Get counters of redirect cache, shared cache and shared table
+    in this process.
+    Only admin can see it.
+    """
+    return dict(
+        redirect_cache.stats(),
+        shared=shared_cache.stats(),
+        table=redirect_table.stats(),
+    )
+
+
+@router.get("/api/stats/sweeper")
+async def read_sweeper_stats(
+    current_user: User = Depends(get_current_active_superuser),
+) -> Any:
+    """
+    Get counters of expired links sweeper in this process.
+    Only admin can see it.
+    """
+    return sweeper_stats
+
+
+@router.get("/api/stats/pool")
+async def read_pool_stats(
+    current_user: User = Depends(get_current_active_superuser),
+) -> Any:
+    """
+    Get gauges and counters of database connection pool in this process,
+    pools of replicas are in the list of replicas.
+    Only admin can see it.
+    """
+    return dict(
+        async_pool_stats.snapshot(),
+        replicas=[stats.snapshot() for stats in replica_pool_stats],
+    )
+
+
+@router.get("/api/stats/bloom")
+async def read_bloom_stats(
+    current_user: User = Depends(get_current_active_superuser),
+) -> Any:
+    """
+    Get size and expected error rate of short links filter in this process.
+    Only admin can see it.
+    """
+    return short_code_filter.stats()
@@ -3,10 +3,12 @@ from typing import Any
 
 from fastapi import APIRouter, HTTPException, Depends, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from schemas.user import UserCreate, User, Token
 from utils import users as users_utils
+from utils.executors import ExecutorBusyError
 from settings import ACCESS_TOKEN_EXPIRE_MINUTES
 
 from .deps import get_db, get_current_active_user
@@ -16,37 +18,56 @@ from models.user import User as UserModel
 router = APIRouter()
 
 
+def hashing_busy_error() -> HTTPException:
+    """Error for requests when all hashing threads are busy"""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many requests for authentication, try later",
+        headers={"Retry-After": "1"},
+    )
+
+
 @router.post("/api/sign-up", response_model=User)
-def create_user(
+async def create_user(
         user: UserCreate,
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_db)
 ) -> User:
     """Creates users if it not in database"""
-    found_user = db.query(UserModel).filter(UserModel.email == user.email).first()
+    result = await db.execute(
+        select(UserModel).filter(UserModel.email == user.email)
+    )
+    found_user = result.scalars().first()
     if found_user:
         raise HTTPException(status_code=400, detail="Email already registered")
+    try:
+        password = await users_utils.get_password_hash(user.password)
+    except ExecutorBusyError:
+        raise hashing_busy_error()
     user_add = UserModel(
         username=user.username,
         email=user.email,
-        password=users_utils.get_password_hash(user.password)
+        password=password
     )
     db.add(user_add)
-    db.commit()
-    db.refresh(user_add)
+    await db.commit()
+    await db.refresh(user_add)
     return user_add
 
 
 @router.post("/api/token", response_model=Token)
 async def login_for_access_token(
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_db),
         form_data: OAuth2PasswordRequestForm = Depends(),
 ) -> Any:
     """Creates token for user after successful authentication"""
-    user = users_utils.authenticate_user(
-        db,
-        form_data.username,
-        form_data.password
-    )
+    try:
+        user = await users_utils.authenticate_user(
+            db,
+            form_data.username,
+            form_data.password
+        )
+    except ExecutorBusyError:
+        raise hashing_busy_error()
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -55,7 +76,8 @@ async def login_for_access_token(
         )
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = users_utils.create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data=users_utils.get_token_claims(user),
+        expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import List
 from pydantic import BaseModel, AnyUrl
 
 
@@ -23,3 +24,20 @@ class Link(BaseModel):
 
     class Config:
         orm_mode = True
+
+
+class ClicksPoint(BaseModel):
+    """Schema for clicks of link in one period"""
+    period: datetime
+    clicks: int
+
+
+class LinkStats(BaseModel):
+    """Schema for retrieve clicks statistics of link"""
+    link_id: int
+    granularity: str
+    start: datetime
+    end: datetime
+    clicks: int
+    unique_visitors: int
+    series: List[ClicksPoint]
@@ -12,6 +12,9 @@ class TokenData(BaseModel):
     """Schema for other type of token in headers"""
     sub: Optional[str] = None
     exp: Optional[int] = None
+    id: Optional[int] = None
+    is_active: Optional[bool] = None
+    is_admin: Optional[bool] = None
 
 
 class UserCreate(BaseModel):
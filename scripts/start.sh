@@ -1,3 +1,12 @@
 #!/bin/bash
 
-uvicorn --port 80 --host 0.0.0.0 main:app --reload
\ No newline at end of file
+# Mode is first argument or APP_MODE: dev (by default) or prod
+MODE=${1:-${APP_MODE:-dev}}
+
+if [ "$MODE" = "prod" ]; then
+    # schema is managed by alembic in production
+    export CREATE_SCHEMA=${CREATE_SCHEMA:-false}
+    exec gunicorn -c gunicorn.conf.py main:app
+else
+    exec uvicorn --port 80 --host 0.0.0.0 main:app --reload
+fi
@@ -0,0 +1,36 @@
+"""
+Loader of redirect table in shared memory.
+
+Gunicorn starts it from gunicorn.conf.py when SHARED_TABLE=true.
+Without gunicorn run one loader next to workers of the host:
+
+    python table_loader.py
+"""
+import asyncio
+import logging
+
+from settings import SHARED_TABLE_REFRESH_SECONDS
+from utils.links import load_redirect_table, redirect_table
+
+
+logger = logging.getLogger("table_loader")
+
+
+async def run() -> None:
+    redirect_table.create()
+    while True:
+        try:
+            count = await load_redirect_table()
+            logger.info("Loaded %s links to shared table", count)
+        except Exception:
+            logger.exception("Shared table is not loaded")
+        await asyncio.sleep(SHARED_TABLE_REFRESH_SECONDS)
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,7 @@ from sqlalchemy.orm import Session
 
 from db import SessionLocal
 from main import app
+from .fake_redis import FakeRedisServer
 from .utils import (
     user_authentication_headers,
     create_test_user,
@@ -27,6 +28,13 @@ def client(db: Session) -> Generator:
         delete_test_user(db)
 
 
+@pytest.fixture()
+def fake_redis() -> Generator:
+    server = FakeRedisServer().start()
+    yield server
+    server.stop()
+
+
 @pytest.fixture(scope="module")
 def normal_user_token_headers(client: TestClient, db: Session) -> Dict[str, str]:
     return user_authentication_headers(
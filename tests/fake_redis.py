@@ -0,0 +1,117 @@
+import asyncio
+import threading
+from time import monotonic
+from typing import Dict, List, Optional, Tuple
+
+from utils.shared_cache import encode_command
+
+
+class FakeRedisServer:
+    """
+    In-process server speaking Redis protocol for tests.
+    Supports GET, SET with PX and NX, DEL, PUBLISH and SUBSCRIBE.
+    It runs its own event loop in a thread, like separate server.
+    """
+
+    def __init__(self):
+        self.data: Dict[bytes, Tuple[bytes, Optional[float]]] = {}
+        self.published: List[Tuple[bytes, bytes]] = []
+        self._subscribers: Dict[bytes, List[asyncio.StreamWriter]] = {}
+        self._writers: List[asyncio.StreamWriter] = []
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._server = None
+        self.port = 0
+
+    @property
+    def url(self) -> str:
+        return "redis://127.0.0.1:%d/0" % self.port
+
+    def start(self) -> "FakeRedisServer":
+        self._thread.start()
+        self._server = self._call(asyncio.start_server(
+            self._handle, "127.0.0.1", 0
+        ))
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    def stop(self) -> None:
+        self.disconnect_all()
+        self._server.close()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+    def disconnect_all(self) -> None:
+        """Breaks connections of all clients"""
+        async def close():
+            for writer in self._writers:
+                writer.close()
+
+        self._call(close())
+
+    def _call(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result(5)
+
+    def get(self, key: str) -> Optional[bytes]:
+        item = self.data.get(key.encode())
+        if item is None or (item[1] is not None and item[1] <= monotonic()):
+            return None
+        return item[0]
+
+    def ttl(self, key: str) -> Optional[float]:
+        item = self.data.get(key.encode())
+        return None if item is None or item[1] is None else item[1] - monotonic()
+
+    async def _read_command(self, reader: asyncio.StreamReader) -> List[bytes]:
+        count = int((await reader.readuntil(b"\r\n"))[1:-2])
+        args = []
+        for _ in range(count):
+            length = int((await reader.readuntil(b"\r\n"))[1:-2])
+            args.append((await reader.readexactly(length + 2))[:-2])
+        return args
+
+    async def _handle(self, reader, writer) -> None:
+        self._writers.append(writer)
+        try:
+            while True:
+                args = await self._read_command(reader)
+                writer.write(self._execute(args, writer))
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            writer.close()
+
+    def _execute(self, args: List[bytes], writer) -> bytes:
+        command = args[0].upper()
+        if command in (b"PING", b"AUTH", b"SELECT"):
+            return b"+OK\r\n"
+        if command == b"GET":
+            value = self.get(args[1].decode())
+            if value is None:
+                return b"$-1\r\n"
+            return b"$%d\r\n%s\r\n" % (len(value), value)
+        if command == b"SET":
+            deadline = None
+            options = [arg.upper() for arg in args[3:]]
+            if b"PX" in options:
+                deadline = monotonic() + int(options[options.index(b"PX") + 1]) / 1000
+            if b"NX" in options and self.get(args[1].decode()) is not None:
+                return b"$-1\r\n"
+            self.data[args[1]] = (args[2], deadline)
+            return b"+OK\r\n"
+        if command == b"DEL":
+            removed = sum(self.data.pop(key, None) is not None for key in args[1:])
+            return b":%d\r\n" % removed
+        if command == b"PUBLISH":
+            self.published.append((args[1], args[2]))
+            subscribers = [
+                subscriber for subscriber in self._subscribers.get(args[1], [])
+                if not subscriber.is_closing()
+            ]
+            for subscriber in subscribers:
+                subscriber.write(encode_command((b"message", args[1], args[2])))
+            return b":%d\r\n" % len(subscribers)
+        if command == b"SUBSCRIBE":
+            self._subscribers.setdefault(args[1], []).append(writer)
+            return b"*3\r\n$9\r\nsubscribe\r\n$%d\r\n%s\r\n:1\r\n" % (
+                len(args[1]), args[1]
+            )
+        return b"-ERR unknown command\r\n"
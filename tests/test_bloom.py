@@ -0,0 +1,134 @@
+import asyncio
+import time
+
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+import utils.links
+from db import replica_router
+from utils.bloom import BloomFilter, RebuildableBloomFilter
+from utils.links import (
+    INVALIDATION_CHANNEL,
+    load_short_code_filter,
+    shared_cache,
+    short_code_filter,
+    start_invalidation_listener,
+)
+from utils.shared_cache import SharedCache
+
+from .fake_redis import FakeRedisServer
+from .utils import create_random_link, random_lower_string
+
+
+def test_bloom_filter() -> None:
+    """test that filter has no false negatives and few false positives"""
+    bloom = BloomFilter(1000, 0.01, max_bytes=1024 * 1024)
+    for i in range(1000):
+        bloom.add("code%s" % i)
+    assert all("code%s" % i in bloom for i in range(1000))
+    false_positives = sum("other%s" % i in bloom for i in range(10000))
+    assert false_positives < 300
+    assert bloom.stats()["error_rate"] < 0.02
+    small = BloomFilter(1000, 0.01, max_bytes=64)
+    assert small.stats()["bytes"] == 64
+
+
+def test_rebuildable_bloom_filter() -> None:
+    """test that values added during rebuild are kept"""
+    live = RebuildableBloomFilter(0.01, max_bytes=1024)
+    assert "anything" in live
+    new_filter = live.start_rebuild(10)
+    new_filter.add("stored")
+    live.add("created")
+    live.finish_rebuild(new_filter)
+    assert "stored" in live
+    assert "created" in live
+    assert "unknown" not in live
+
+
+def test_unknown_short_link_skips_database(
+    client: TestClient,
+    normal_user_token_headers: dict,
+    db: Session,
+    user_id: int,
+    monkeypatch
+) -> None:
+    """test that filtered short links are answered without database"""
+    monkeypatch.setattr(utils.links, "BLOOM_FILTER", True)
+    client.portal.call(load_short_code_filter)
+    item = create_random_link(db, owner_id=user_id)
+    response = client.post(
+        "/api/links", headers=normal_user_token_headers,
+        json={"text": "http://bloom/created"},
+    )
+    created = response.json()
+    assert created["short_text"] in short_code_filter
+    data = {"short_text": "bloom-custom", "expired": created["expired"]}
+    response = client.put(
+        f"/api/link/{created['id']}",
+        headers=normal_user_token_headers,
+        json=data,
+    )
+    assert response.status_code == 200
+    assert "bloom-custom" in short_code_filter
+    # generated code of link created after build is found in database
+    response = client.get("/%s" % item.short_text, allow_redirects=False)
+    assert response.status_code == 307
+    response = client.get("/bloom-custom", allow_redirects=False)
+    assert response.status_code == 307
+
+    def no_database():
+        raise AssertionError("database is used")
+
+    monkeypatch.setattr(replica_router, "get_engine", no_database)
+    response = client.get("/surely-unknown", allow_redirects=False)
+    assert response.status_code == 404
+    client.delete(f"/api/link/{created['id']}", headers=normal_user_token_headers)
+
+
+def set_short_text_by_other_process(db: Session, item) -> str:
+    short_text = random_lower_string()
+    item.short_text = short_text
+    db.commit()
+    return short_text
+
+
+def test_custom_short_link_of_other_process(
+    client: TestClient, db: Session, user_id: int
+) -> None:
+    """test that without shared cache link changed elsewhere is found"""
+    assert not utils.links.BLOOM_FILTER
+    item = create_random_link(db, owner_id=user_id)
+    client.portal.call(load_short_code_filter)
+    short_text = set_short_text_by_other_process(db, item)
+    assert short_text not in short_code_filter
+    response = client.get("/%s" % short_text, allow_redirects=False)
+    assert response.status_code == 307
+
+
+def test_custom_short_link_published_by_other_process(
+    client: TestClient,
+    db: Session,
+    user_id: int,
+    fake_redis: FakeRedisServer,
+    monkeypatch,
+) -> None:
+    """test that filter learns link changed by other process from shared cache"""
+    monkeypatch.setattr(utils.links, "BLOOM_FILTER", True)
+    monkeypatch.setattr(shared_cache, "url", fake_redis.url)
+    item = create_random_link(db, owner_id=user_id)
+    client.portal.call(load_short_code_filter)
+    client.portal.call(start_invalidation_listener)
+    try:
+        time.sleep(0.1)
+        short_text = set_short_text_by_other_process(db, item)
+        other = SharedCache(fake_redis.url, shared_cache.prefix, 1, 1)
+        asyncio.run(other.invalidate(INVALIDATION_CHANNEL, [short_text]))
+        for _ in range(50):
+            if short_text in short_code_filter:
+                break
+            time.sleep(0.01)
+        response = client.get("/%s" % short_text, allow_redirects=False)
+        assert response.status_code == 307
+    finally:
+        client.portal.call(shared_cache.close)
@@ -0,0 +1,35 @@
+from time import sleep
+
+from utils.cache import TTLLRUCache
+
+
+def test_cache_lru_eviction() -> None:
+    """test that least recently used entry is evicted first"""
+    cache = TTLLRUCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    stats = cache.stats()
+    assert stats["size"] == 2
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 3
+    assert stats["misses"] == 1
+
+
+def test_cache_ttl() -> None:
+    """test that entry ttl can be shortened but not extended"""
+    cache = TTLLRUCache(maxsize=10, ttl=0.05)
+    cache.set("short", 1, ttl=0.01)
+    cache.set("long", 2, ttl=3600)
+    cache.set("gone", 3, ttl=-1)
+    assert cache.get("gone") is None
+    sleep(0.02)
+    assert cache.get("short") is None
+    assert cache.get("long") == 2
+    sleep(0.04)
+    assert cache.purge() == 1
+    assert len(cache) == 0
@@ -0,0 +1,172 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from models.click import LinkClick
+from models.visitor import LinkVisitors
+import utils.clicks
+from utils.clicks import ClickAggregator, click_aggregator, visitor_key
+from utils.hll import HyperLogLog
+
+from .utils import create_random_link
+
+
+def test_link_clicks_stats(
+    client: TestClient,
+    normal_user_token_headers: dict,
+    db: Session,
+    user_id: int
+) -> None:
+    """test that clicks are counted and returned by hours and days"""
+    item = create_random_link(db, owner_id=user_id)
+    for _ in range(3):
+        response = client.get("/%s" % item.short_text, allow_redirects=False)
+        assert response.status_code == 307
+    assert client.portal.call(click_aggregator.flush) >= 3
+    assert click_aggregator.pending == 0
+    client.get("/%s" % item.short_text, allow_redirects=False)
+    client.portal.call(click_aggregator.flush)
+    for granularity in ("hour", "day"):
+        response = client.get(
+            f"/api/link/{item.id}/stats",
+            headers=normal_user_token_headers,
+            params={"granularity": granularity},
+        )
+        assert response.status_code == 200
+        content = response.json()
+        assert content["link_id"] == item.id
+        assert content["granularity"] == granularity
+        assert content["clicks"] == 4
+        assert len(content["series"]) == 1
+        assert content["series"][0]["clicks"] == 4
+
+
+def test_clicks_not_flushed_after_failure(client: TestClient, monkeypatch) -> None:
+    """test that clicks do not start flush again right after failure"""
+    attempts = []
+
+    def fail(counts):
+        attempts.append(counts)
+        raise OSError("database is down")
+
+    monkeypatch.setattr(utils.clicks, "upsert_clicks", fail)
+    aggregator = ClickAggregator(flush_events=1, precision=10)
+
+    async def run():
+        aggregator.record(1)
+        await asyncio.sleep(0.1)
+        assert len(attempts) == 1
+        assert aggregator.pending == 1
+        for _ in range(3):
+            aggregator.record(1)
+            await asyncio.sleep(0.01)
+        assert len(attempts) == 1
+        assert aggregator.pending == 4
+
+    client.portal.call(run)
+    assert aggregator.failures == 1
+
+
+def test_link_unique_visitors(
+    client: TestClient,
+    normal_user_token_headers: dict,
+    db: Session,
+    user_id: int
+) -> None:
+    """test that unique visitors are merged with stored sketches"""
+    item = create_random_link(db, owner_id=user_id)
+    for user_agent in ("first", "second", "first"):
+        client.get(
+            "/%s" % item.short_text,
+            headers={"User-Agent": user_agent},
+            allow_redirects=False
+        )
+    client.portal.call(click_aggregator.flush)
+    for user_agent in ("second", "third"):
+        client.get(
+            "/%s" % item.short_text,
+            headers={"User-Agent": user_agent},
+            allow_redirects=False
+        )
+    client.portal.call(click_aggregator.flush)
+    response = client.get(
+        f"/api/link/{item.id}/stats", headers=normal_user_token_headers,
+    )
+    assert response.status_code == 200
+    content = response.json()
+    assert content["clicks"] == 5
+    assert content["unique_visitors"] == 3
+
+
+def test_visitors_merged_with_other_precision(
+    client: TestClient,
+    normal_user_token_headers: dict,
+    db: Session,
+    user_id: int
+) -> None:
+    """test that sketch stored with other precision does not stop flush"""
+    item = create_random_link(db, owner_id=user_id)
+    client.get(
+        "/%s" % item.short_text,
+        headers={"User-Agent": "first"},
+        allow_redirects=False,
+    )
+    client.portal.call(click_aggregator.flush)
+    stored = HyperLogLog(10)
+    stored.add(visitor_key("testclient", "old"))
+    db.query(LinkVisitors).filter(LinkVisitors.link_id == item.id).update(
+        {"sketch": stored.to_bytes()}
+    )
+    db.commit()
+    client.get(
+        "/%s" % item.short_text,
+        headers={"User-Agent": "second"},
+        allow_redirects=False,
+    )
+    client.portal.call(click_aggregator.flush)
+    assert click_aggregator.pending == 0
+    response = client.get(
+        f"/api/link/{item.id}/stats", headers=normal_user_token_headers,
+    )
+    assert response.json()["unique_visitors"] == 2
+
+
+def test_clicks_of_deleted_link_are_skipped(
+    client: TestClient,
+    db: Session,
+    user_id: int
+) -> None:
+    """test that flush does not fail for deleted links"""
+    item = create_random_link(db, owner_id=user_id)
+    item_id = item.id
+    client.get("/%s" % item.short_text, allow_redirects=False)
+    db.delete(item)
+    db.commit()
+    client.portal.call(click_aggregator.flush)
+    assert click_aggregator.pending == 0
+    assert not db.query(LinkClick).filter(LinkClick.link_id == item_id).count()
+
+
+def test_link_stats_with_timezone(
+    client: TestClient,
+    normal_user_token_headers: dict,
+    db: Session,
+    user_id: int
+) -> None:
+    """test that period with timezone is converted to UTC of database"""
+    item = create_random_link(db, owner_id=user_id)
+    client.get("/%s" % item.short_text, allow_redirects=False)
+    client.portal.call(click_aggregator.flush)
+    now = datetime.now(timezone(timedelta(hours=3)))
+    response = client.get(
+        f"/api/link/{item.id}/stats",
+        headers=normal_user_token_headers,
+        params={
+            "start": (now - timedelta(hours=2)).isoformat(),
+            "end": (now + timedelta(hours=1)).isoformat(),
+        },
+    )
+    assert response.status_code == 200
+    assert response.json()["clicks"] == 1
@@ -0,0 +1,29 @@
+import asyncio
+from threading import Event
+
+import pytest
+
+from utils.executors import BoundedExecutor, ExecutorBusyError
+
+
+def test_bounded_executor_rejects_when_saturated() -> None:
+    """test that executor refuses tasks over max_pending"""
+    executor = BoundedExecutor(workers=1, max_pending=2, name="test")
+    release = Event()
+
+    async def run() -> None:
+        tasks = [
+            asyncio.ensure_future(executor.run(release.wait)) for _ in range(2)
+        ]
+        await asyncio.sleep(0)
+        assert executor.pending == 2
+        with pytest.raises(ExecutorBusyError):
+            await executor.run(release.wait)
+        release.set()
+        assert await asyncio.gather(*tasks) == [True, True]
+        assert executor.pending == 0
+        assert await executor.run(sum, [1, 2]) == 3
+
+    asyncio.run(run())
+    assert executor.rejected == 1
+    executor.shutdown()
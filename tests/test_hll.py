@@ -0,0 +1,45 @@
+import pytest
+
+from utils.hll import HyperLogLog
+
+
+def test_hll_count_is_approximate() -> None:
+    """test that estimate is close to number of unique values"""
+    sketch = HyperLogLog(12)
+    for i in range(20000):
+        sketch.add(b"visitor %d" % (i % 10000))
+    assert abs(sketch.count() - 10000) < 500
+    small = HyperLogLog(12)
+    for i in range(10):
+        small.add(b"visitor %d" % i)
+    assert small.count() == 10
+
+
+def test_hll_merge_and_bytes() -> None:
+    """test that stored sketches can be merged"""
+    first = HyperLogLog(12)
+    second = HyperLogLog(12)
+    for i in range(3000):
+        first.add(b"%d" % i)
+    for i in range(2000, 5000):
+        second.add(b"%d" % i)
+    stored = first.to_bytes()
+    assert len(stored) == 4096
+    merged = HyperLogLog.from_bytes(stored)
+    merged.merge(second)
+    assert abs(merged.count() - 5000) < 250
+    merged.merge(HyperLogLog(10))
+    assert merged.precision == 10
+    assert abs(merged.count() - 5000) < 500
+
+
+def test_hll_fold_to_lower_precision() -> None:
+    """test that folded sketch equals sketch of lower precision"""
+    high = HyperLogLog(12)
+    low = HyperLogLog(10)
+    for i in range(3000):
+        high.add(b"%d" % i)
+        low.add(b"%d" % i)
+    assert high.fold(10).to_bytes() == low.to_bytes()
+    with pytest.raises(ValueError):
+        low.fold(12)
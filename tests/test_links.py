@@ -1,8 +1,13 @@
+import csv
+import json
 from datetime import datetime, timedelta
+from io import StringIO
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
 
 from models.link import Link
+from settings import LINKS_BATCH_MAX_SIZE
+from utils.links import encode_cursor, redirect_cache
 
 from .utils import create_random_link
 
@@ -31,6 +36,79 @@ def test_create_link(
     db.commit()
 
 
+def test_create_link_existing_text(
+    client: TestClient,
+    normal_user_token_headers: dict,
+    db: Session
+) -> None:
+    """test that the same long link is created only once"""
+    data = {"text": "http://Foo/same"}
+    response = client.post(
+        "/api/links", headers=normal_user_token_headers, json=data,
+    )
+    assert response.status_code == 200
+    first = response.json()
+    response = client.post(
+        "/api/links", headers=normal_user_token_headers, json=data,
+    )
+    assert response.status_code == 200
+    assert response.json() == first
+    assert db.query(Link).filter(Link.text == data["text"]).count() == 1
+    db.delete(db.query(Link).get(first["id"]))
+    db.commit()
+
+
+def test_create_links_batch(
+    client: TestClient,
+    normal_user_token_headers: dict,
+    db: Session,
+    user_id: int
+) -> None:
+    """test for create many links at once"""
+    item = create_random_link(db, owner_id=user_id)
+    texts = ["http://batch/%s" % i for i in range(3)]
+    data = [
+        {"text": texts[0]},
+        {"text": item.text},
+        {"text": texts[1]},
+        {"text": texts[0]},
+        {"text": texts[2]},
+    ]
+    response = client.post(
+        "/api/links/batch", headers=normal_user_token_headers, json=data,
+    )
+    assert response.status_code == 200
+    content = response.json()
+    assert [link["text"] for link in content] == [
+        link["text"] for link in data
+    ]
+    assert content[1]["id"] == item.id
+    assert content[1]["short_text"] == item.short_text
+    assert content[0] == content[3]
+    assert len({link["short_text"] for link in content}) == 4
+    for link in content:
+        assert link["owner_id"] == user_id
+    db.query(Link).filter(Link.text.in_(texts)).delete(
+        synchronize_session=False
+    )
+    db.commit()
+
+
+def test_create_links_batch_too_large(
+    client: TestClient,
+    normal_user_token_headers: dict
+) -> None:
+    """test that size of batch is limited"""
+    data = [
+        {"text": "http://batch/%s" % i}
+        for i in range(LINKS_BATCH_MAX_SIZE + 1)
+    ]
+    response = client.post(
+        "/api/links/batch", headers=normal_user_token_headers, json=data,
+    )
+    assert response.status_code == 400
+
+
 def test_read_link(
     client: TestClient,
     normal_user_token_headers: dict,
@@ -108,6 +186,82 @@ def test_get_links(
     assert item2.text in [link["text"] for link in content]
 
 
+def test_get_links_cursor(
+    client: TestClient,
+    normal_user_token_headers: dict,
+    db: Session,
+    user_id: int
+) -> None:
+    """test for get links of current user page by page"""
+    items = [create_random_link(db, owner_id=user_id) for _ in range(3)]
+    ids = []
+    params = {"limit": 2}
+    while True:
+        response = client.get(
+            "/api/links", headers=normal_user_token_headers, params=params
+        )
+        assert response.status_code == 200
+        content = response.json()
+        assert len(content) <= 2
+        ids += [link["id"] for link in content]
+        if "x-next-cursor" not in response.headers:
+            break
+        params["after"] = response.headers["x-next-cursor"]
+    assert ids == sorted(ids)
+    assert len(ids) == len(set(ids))
+    for item in items:
+        assert item.id in ids
+    response = client.get(
+        "/api/links",
+        headers=normal_user_token_headers,
+        params={"after": "broken"}
+    )
+    assert response.status_code == 400
+    for link_id in (0, 2 ** 31):
+        response = client.get(
+            "/api/links",
+            headers=normal_user_token_headers,
+            params={"after": encode_cursor(link_id)}
+        )
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Invalid cursor"
+
+
+def test_export_links(
+    client: TestClient,
+    normal_user_token_headers: dict,
+    db: Session,
+    user_id: int
+) -> None:
+    """test for export links of current user as NDJSON and CSV"""
+    item = create_random_link(db, owner_id=user_id)
+    response = client.get(
+        "/api/links/export", headers=normal_user_token_headers,
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    links = [json.loads(line) for line in response.text.splitlines()]
+    assert item.id in [link["id"] for link in links]
+    for link in links:
+        assert link["owner_id"] == user_id
+    response = client.get(
+        "/api/links/export",
+        headers=normal_user_token_headers,
+        params={"format": "csv"}
+    )
+    assert response.status_code == 200
+    rows = list(csv.DictReader(StringIO(response.text)))
+    assert len(rows) == len(links)
+    assert [int(row["id"]) for row in rows] == [link["id"] for link in links]
+    assert item.short_text in [row["short_text"] for row in rows]
+    response = client.get(
+        "/api/links/export",
+        headers=normal_user_token_headers,
+        params={"format": "xml"}
+    )
+    assert response.status_code == 422
+
+
 def test_link_redirect(
     client: TestClient,
     normal_user_token_headers: dict
@@ -152,3 +306,58 @@ def test_delete_link(
     assert content["deleted"]
     db_obj = db.query(Link).get(id)
     assert not db_obj
+
+
+def test_link_redirect_cache(
+    client: TestClient,
+    normal_user_token_headers: dict,
+    db: Session,
+    user_id: int
+) -> None:
+    """test redirect cache is filled and invalidated after update"""
+    item = create_random_link(db, owner_id=user_id)
+    response = client.get("/%s" % item.short_text, allow_redirects=False)
+    assert response.status_code == 307
+    assert redirect_cache.get(item.short_text).text == item.text
+    data = {
+        "short_text": "cached_%s" % item.id,
+        "expired": (
+                datetime.utcnow() + timedelta(days=2)
+        ).strftime("%Y-%m-%dT%H:%M")
+    }
+    response = client.put(
+        f"/api/link/{item.id}",
+        headers=normal_user_token_headers,
+        json=data
+    )
+    assert response.status_code == 200
+    assert redirect_cache.get(item.short_text) is None
+    response = client.get("/%s" % data["short_text"], allow_redirects=False)
+    assert response.status_code == 307
+    assert response.headers["location"] == item.text
+    response = client.delete(
+        f"/api/link/{item.id}", headers=normal_user_token_headers
+    )
+    assert response.status_code == 200
+    assert redirect_cache.get(data["short_text"]) is None
+
+
+def test_update_link_short_text_taken(
+    client: TestClient,
+    normal_user_token_headers: dict,
+    db: Session,
+    user_id: int
+) -> None:
+    """test that short link can not be set to already used one"""
+    item1 = create_random_link(db, owner_id=user_id)
+    item2 = create_random_link(db, owner_id=user_id)
+    data = {
+        "short_text": item1.short_text,
+        "expired": item2.expired.strftime("%Y-%m-%dT%H:%M")
+    }
+    response = client.put(
+        f"/api/link/{item2.id}",
+        headers=normal_user_token_headers,
+        json=data
+    )
+    assert response.status_code == 400
@@ -0,0 +1,62 @@
+import os
+
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from utils.metrics import Histogram, get_statement_type, track_task
+
+from .utils import create_random_link
+
+
+def test_histogram_render() -> None:
+    """test that histogram buckets are cumulative"""
+    histogram = Histogram("latency_seconds", "Latency.", ("route",), (0.1, 1))
+    for value in (0.05, 0.5, 0.7, 3):
+        histogram.observe(value, "/a")
+    lines = histogram.render()
+    assert lines[1] == "# TYPE latency_seconds histogram"
+    assert lines[2:] == [
+        'latency_seconds_bucket{route="/a",le="0.1"} 1.0',
+        'latency_seconds_bucket{route="/a",le="1"} 3.0',
+        'latency_seconds_bucket{route="/a",le="+Inf"} 4.0',
+        'latency_seconds_sum{route="/a"} 4.25',
+        'latency_seconds_count{route="/a"} 4.0',
+    ]
+    assert get_statement_type("\n  select 1") == "SELECT"
+    assert get_statement_type("SET x = 1") == "OTHER"
+
+
+def test_metrics_endpoint(
+    client: TestClient,
+    normal_user_token_headers: dict,
+    db: Session,
+    user_id: int
+) -> None:
+    """test that requests are counted by route templates"""
+    item = create_random_link(db, owner_id=user_id)
+    client.get("/%s" % item.short_text, allow_redirects=False)
+    client.get(f"/api/link/{item.id}", headers=normal_user_token_headers)
+
+    @track_task("test_task")
+    async def task():
+        pass
+
+    client.portal.call(task)
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+    worker = 'worker="%s"' % os.getpid()
+    assert (
+        'http_requests_total{%s,method="GET",route="/{short_text}",status="307"}'
+        % worker in text
+    )
+    assert (
+        'http_requests_total{%s,method="GET",route="/api/link/{id}",status="200"}'
+        % worker in text
+    )
+    assert item.short_text not in text
+    assert 'db_query_duration_seconds_count{%s,statement="SELECT"}' % worker in text
+    assert 'background_task_runs_total{%s,task="test_task"} 1.0' % worker in text
+    assert 'cache_entries{%s,cache="redirect"}' % worker in text
+    assert 'shared_cache_errors_total{%s}' % worker in text
@@ -0,0 +1,63 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, exc, text
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import QueuePool
+
+from db import async_engine, engine, pool_stats
+from main import reset_worker_state
+from settings import DATABASE_URL, DB_STATEMENT_TIMEOUT_MS
+from utils.links import redirect_cache, short_codes
+from utils.pool import PoolStats, instrument_engine, instrumented_pool_class
+
+from .utils import create_random_link
+
+
+def test_pool_stats_and_statement_timeout() -> None:
+    """test that checkouts are counted and statement timeout is set"""
+    checkouts = pool_stats.checkouts
+    with engine.connect() as conn:
+        timeout = conn.execute(text(
+            "SELECT setting FROM pg_settings WHERE name = 'statement_timeout'"
+        )).scalar()
+        assert pool_stats.snapshot()["in_use"] >= 1
+    assert int(timeout) == DB_STATEMENT_TIMEOUT_MS
+    assert pool_stats.checkouts == checkouts + 1
+    assert pool_stats.connects >= 1
+
+
+def test_pool_stats_timeouts() -> None:
+    """test that waits for connection are measured"""
+    stats = PoolStats()
+    small_engine = create_engine(
+        DATABASE_URL,
+        poolclass=instrumented_pool_class(QueuePool, stats),
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.1,
+    )
+    instrument_engine(small_engine, stats)
+    with small_engine.connect():
+        with pytest.raises(exc.TimeoutError):
+            small_engine.connect()
+    small_engine.dispose()
+    snapshot = stats.snapshot()
+    assert snapshot["timeouts"] == 1
+    assert snapshot["checkouts"] == 2
+    assert snapshot["max_wait_seconds"] >= 0.1
+    assert snapshot["connects"] == 1
+    assert snapshot["closes"] == 1
+
+
+def test_reset_worker_state(client: TestClient, db: Session, user_id: int) -> None:
+    """test that forked worker drops connections, caches and leased codes"""
+    item = create_random_link(db, owner_id=user_id)
+    response = client.get("/%s" % item.short_text, allow_redirects=False)
+    assert response.status_code == 307
+    assert len(redirect_cache) > 0
+    reset_worker_state()
+    assert len(redirect_cache) == 0
+    assert short_codes.take(1) == []
+    assert async_engine.sync_engine.pool.checkedin() == 0
+    response = client.get("/%s" % item.short_text, allow_redirects=False)
+    assert response.status_code == 307
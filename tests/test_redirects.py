@@ -0,0 +1,34 @@
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from utils.links import redirect_cache
+
+from .utils import create_random_link
+
+
+def test_fast_redirect(
+    client: TestClient,
+    db: Session,
+    user_id: int
+) -> None:
+    """test redirect by fast path from database and from cache"""
+    item = create_random_link(db, owner_id=user_id)
+    item.text = "http://fast/path with space"
+    db.commit()
+    redirect_cache.pop(item.short_text)
+    for _ in range(2):
+        response = client.get("/%s" % item.short_text, allow_redirects=False)
+        assert response.status_code == 307
+        assert response.headers["location"] == "http://fast/path%20with%20space"
+        assert response.headers["content-length"] == "0"
+        assert redirect_cache.get(item.short_text).id == item.id
+
+
+def test_fast_redirect_not_found_and_other_routes(client: TestClient) -> None:
+    """test that unknown link is 404 and application routes still work"""
+    response = client.get("/no-such-link", allow_redirects=False)
+    assert response.status_code == 404
+    assert response.json() == {"detail": "Link not found"}
+    assert client.get("/docs").status_code == 200
+    assert client.get("/openapi.json").status_code == 200
+    assert client.post("/no-such-link").status_code == 405
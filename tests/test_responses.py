@@ -0,0 +1,47 @@
+import json
+from datetime import datetime
+
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from schemas.link import Link
+from utils.responses import dump_json
+
+from .utils import create_random_link
+
+
+def test_dump_json_like_pydantic() -> None:
+    """test that fast serialization keeps format of response model"""
+    link = Link(
+        id=1,
+        text="http://юникод",
+        short_text="abc",
+        expired=datetime(2030, 1, 2, 3, 4, 5, 120),
+        owner_id=2,
+    )
+    expected = json.loads(link.json())
+    assert json.loads(dump_json(link.dict())) == expected
+
+
+def test_get_links_gzip(
+    client: TestClient,
+    normal_user_token_headers: dict,
+    db: Session,
+    user_id: int
+) -> None:
+    """test that big page is compressed and small one is not"""
+    for _ in range(20):
+        create_random_link(db, owner_id=user_id)
+    response = client.get(
+        "/api/links",
+        headers=dict(normal_user_token_headers, **{"Accept-Encoding": "gzip"}),
+    )
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert len(response.json()) >= 20
+    response = client.get(
+        "/api/links?limit=1",
+        headers=dict(normal_user_token_headers, **{"Accept-Encoding": "gzip"}),
+    )
+    assert "content-encoding" not in response.headers
+    assert response.headers["X-Next-Cursor"]
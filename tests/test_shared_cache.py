@@ -0,0 +1,147 @@
+import asyncio
+import socket
+
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from utils.links import INVALIDATION_CHANNEL, redirect_cache, shared_cache
+from utils.shared_cache import TOMBSTONE, SharedCache
+
+from .fake_redis import FakeRedisServer
+from .utils import create_random_link, random_lower_string
+
+
+def test_shared_cache_invalidation(fake_redis: FakeRedisServer) -> None:
+    """test that value expires and invalidation reaches other process"""
+    received = []
+
+    async def run():
+        writer = SharedCache(fake_redis.url, "test:", 1, 1)
+        reader = SharedCache(fake_redis.url, "test:", 1, 1)
+        reader.start_listener("test:channel", received.append, received.clear)
+        await writer.set("key", b"value", 60)
+        assert await reader.get("key") == b"value"
+        assert 0 < fake_redis.ttl("test:key") <= 60
+        await asyncio.sleep(0.1)
+        await writer.invalidate("test:channel", ["key"])
+        for _ in range(50):
+            if received:
+                break
+            await asyncio.sleep(0.01)
+        assert await reader.get("key") is None
+        assert reader.stats()["hits"] == 1 and reader.stats()["misses"] == 1
+        writer.close()
+        reader.close()
+
+    asyncio.run(run())
+    assert received == ["key"]
+
+
+def test_shared_cache_unavailable() -> None:
+    """test that unavailable cache misses without retries"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    cache = SharedCache("redis://127.0.0.1:%d/0" % port, "test:", 1, 60)
+
+    async def run():
+        assert await cache.get("key") is None
+        await cache.set("key", b"value", 60)
+        assert await cache.get("key") is None
+
+    asyncio.run(run())
+    assert cache.stats()["errors"] == 1
+    assert not cache.available()
+
+
+def test_invalidation_after_failure(fake_redis: FakeRedisServer) -> None:
+    """test that invalidations are tried when cache is down and replayed"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    cache = SharedCache("redis://127.0.0.1:%d/0" % port, "test:", 1, 60)
+
+    async def run():
+        await cache.invalidate("test:channel", ["lost"])
+        assert cache.stats()["pending_invalidations"] == 1
+        assert not cache.available()
+        # cache answers again, but was marked unavailable
+        cache.url = fake_redis.url
+        await cache.invalidate("test:channel", ["key"])
+        assert fake_redis.get("test:key") == TOMBSTONE
+        assert fake_redis.get("test:lost") == TOMBSTONE
+        assert cache.stats()["pending_invalidations"] == 0
+        assert cache.available()
+        # value read from database before invalidation does not come back
+        await cache.set("key", b"stale", 60)
+        assert await cache.get("key") is None
+        cache.close()
+
+    asyncio.run(run())
+    assert (b"test:channel", b"lost") in fake_redis.published
+    assert (b"test:channel", b"key") in fake_redis.published
+
+
+def test_invalidation_replayed(fake_redis: FakeRedisServer) -> None:
+    """test that failed invalidation is sent when cache answers"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    cache = SharedCache("redis://127.0.0.1:%d/0" % port, "test:", 1, 0)
+
+    async def run():
+        await cache.invalidate("test:channel", ["replayed"])
+        assert cache.stats()["pending_invalidations"] == 1
+        cache.url = fake_redis.url
+        assert await cache.get("other") is None
+        for _ in range(50):
+            if not cache.stats()["pending_invalidations"]:
+                break
+            await asyncio.sleep(0.01)
+        cache.close()
+
+    asyncio.run(run())
+    assert fake_redis.get("test:replayed") == TOMBSTONE
+    assert (b"test:channel", b"replayed") in fake_redis.published
+
+
+def test_redirect_with_shared_cache(
+    client: TestClient,
+    normal_user_token_headers: dict,
+    db: Session,
+    user_id: int,
+    fake_redis: FakeRedisServer,
+    monkeypatch,
+) -> None:
+    """test that redirects are shared and invalidated on update"""
+    monkeypatch.setattr(shared_cache, "url", fake_redis.url)
+    item = create_random_link(db, owner_id=user_id)
+    key = shared_cache.prefix + item.short_text
+    try:
+        response = client.get("/%s" % item.short_text, allow_redirects=False)
+        assert response.status_code == 307
+        assert fake_redis.get(key) is not None
+        # other worker gets redirect from shared cache
+        redirect_cache.pop(item.short_text)
+        fake_redis.data[key.encode()] = (
+            fake_redis.data[key.encode()][0].replace(b"http", b"shared"), None
+        )
+        response = client.get("/%s" % item.short_text, allow_redirects=False)
+        assert response.headers["location"].startswith("shared")
+        new_short_text = random_lower_string()
+        response = client.put(
+            "/api/link/%s" % item.id,
+            headers=normal_user_token_headers,
+            json={
+                "short_text": new_short_text,
+                "expired": item.expired.isoformat(),
+            },
+        )
+        assert response.status_code == 200
+        assert fake_redis.get(key) == TOMBSTONE
+        assert (
+            INVALIDATION_CHANNEL.encode(), item.short_text.encode()
+        ) in fake_redis.published
+        assert redirect_cache.get(item.short_text) is None
+    finally:
+        client.portal.call(shared_cache.close)
@@ -0,0 +1,90 @@
+import multiprocessing
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+import utils.links
+from utils.links import invalidate_redirects, load_redirect_table, redirect_cache
+from utils.shared_table import SharedRedirectTable
+
+from .utils import create_random_link
+
+
+TABLE_NAME = "test_links_%s" % os.getpid()
+
+
+def make_table() -> SharedRedirectTable:
+    return SharedRedirectTable(TABLE_NAME, capacity=3, arena_bytes=1024, max_age=60)
+
+
+@pytest.fixture()
+def table():
+    loader = make_table()
+    loader.create()
+    yield loader
+    loader.destroy()
+
+
+def read_in_process(queue) -> None:
+    queue.put(make_table().get("abc"))
+
+
+def test_shared_table(table: SharedRedirectTable) -> None:
+    """test that other process reads table and sees new generation"""
+    reader = make_table()
+    assert reader.get("abc") is None
+    table.start_build()
+    assert table.add("abc", "http://example.com/а", 1, 0.0)
+    assert table.add("abd", "http://example.com/b", 2, 1e10)
+    assert table.finish_build() == 2
+    assert reader.get("abc") == (1, "http://example.com/а", 0.0)
+    assert reader.get("abd") == (2, "http://example.com/b", 1e10)
+    assert reader.get("abe") is None
+    context = multiprocessing.get_context("fork")
+    queue = context.Queue()
+    process = context.Process(target=read_in_process, args=(queue,))
+    process.start()
+    assert queue.get(timeout=10) == (1, "http://example.com/а", 0.0)
+    process.join()
+    table.start_build()
+    for index in range(3):
+        assert table.add("code%s" % index, "http://new", index, 0.0)
+    assert not table.add("abc", "http://new", 4, 0.0)
+    assert table.finish_build() == 3
+    assert reader.get("abc") is None
+    assert reader.get("code2") == (2, "http://new", 0.0)
+    assert reader.stats()["generation"] == 2
+    reader.close()
+
+
+def test_redirect_from_shared_table(
+    client: TestClient,
+    db: Session,
+    user_id: int,
+    monkeypatch,
+) -> None:
+    """test that redirect reads table before database until link changes"""
+    table = SharedRedirectTable(
+        TABLE_NAME,
+        capacity=100000,
+        arena_bytes=16 * 1024 * 1024,
+        max_age=60,
+    )
+    monkeypatch.setattr(utils.links, "SHARED_TABLE", True)
+    monkeypatch.setattr(utils.links, "redirect_table", table)
+    table.create()
+    try:
+        item = create_random_link(db, owner_id=user_id)
+        assert client.portal.call(load_redirect_table) >= 1
+        item.text = "http://changed"
+        db.commit()
+        redirect_cache.pop(item.short_text)
+        response = client.get("/%s" % item.short_text, allow_redirects=False)
+        assert response.headers["location"] != "http://changed"
+        client.portal.call(invalidate_redirects, item.short_text)
+        response = client.get("/%s" % item.short_text, allow_redirects=False)
+        assert response.headers["location"] == "http://changed"
+    finally:
+        table.destroy()
@@ -0,0 +1,51 @@
+from sqlalchemy import Sequence
+from sqlalchemy.orm import Session
+
+from models.link import short_code_seq
+from utils.links import short_codes
+from utils.short_codes import ShortCodeAllocator
+
+
+def test_allocator_takes_numbers_from_blocks() -> None:
+    """test that numbers are taken from leased blocks in order"""
+    allocator = ShortCodeAllocator(
+        short_code_seq, block_size=3, salt="salt", min_length=6, alphabet=(
+            "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ1234567890"
+        )
+    )
+    assert allocator.take(1) == []
+    allocator.add_block(1)
+    allocator.add_block(10)
+    assert allocator.take(2) == [1, 2]
+    assert allocator.take(3) == [3, 10, 11]
+    assert allocator.take(5) == [12]
+    codes = {allocator.encode(number) for number in range(1, 1000)}
+    assert len(codes) == 999
+    assert min(len(code) for code in codes) >= 6
+
+
+def test_allocator_leases_blocks_from_sequence(db: Session) -> None:
+    """test that codes leased from database are unique"""
+    count = short_codes.block_size * 2 + 1
+    codes = short_codes.allocate_sync(db, count)
+    db.commit()
+    assert len(codes) == count
+    assert len(set(codes)) == count
+
+
+def test_allocator_uses_increment_of_sequence(db: Session) -> None:
+    """test that blocks have size of sequence increment, not of setting"""
+    sequence = Sequence("test_short_code_seq", start=1, increment=50)
+    sequence.create(db.get_bind(), checkfirst=True)
+    try:
+        allocator = ShortCodeAllocator(
+            sequence, block_size=3, salt="salt", min_length=6,
+            alphabet="abcdefghijklmnopqrstuvwxyz1234567890",
+        )
+        codes = allocator.allocate_sync(db, 60)
+        assert allocator.block_size == 50
+        numbers = [allocator.decode(code) for code in codes]
+        assert numbers == list(range(1, 61))
+    finally:
+        db.rollback()
+        sequence.drop(db.get_bind())
@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from db import engine
+from models.link import Link
+from settings import SWEEPER_LOCK_ID
+from utils import links as links_utils
+from utils.links import cache_redirect, redirect_cache, remove_expired_links
+
+from .utils import create_random_link
+
+
+def test_remove_expired_links_by_chunks(
+    client: TestClient, db: Session, user_id: int, monkeypatch
+) -> None:
+    """test that expired links are removed by chunks"""
+    items = [create_random_link(db, owner_id=user_id) for _ in range(5)]
+    for item in items[:3]:
+        item.expired = datetime.utcnow() - timedelta(minutes=1)
+    db.commit()
+    ids = [item.id for item in items]
+    cache_redirect(items[0])
+    assert redirect_cache.get(items[0].short_text) is None
+    redirect_cache.set(items[0].short_text, "cached")
+    monkeypatch.setattr(links_utils, "SWEEPER_CHUNK_SIZE", 2)
+    sweep = client.portal.call(remove_expired_links)
+    assert sweep.removed >= 3
+    assert sweep.finished
+    assert redirect_cache.get(items[0].short_text) is None
+    db.expire_all()
+    left = {link.id for link in db.query(Link).filter(Link.id.in_(ids))}
+    assert left == set(ids[3:])
+
+
+def test_remove_expired_links_not_leader(client: TestClient) -> None:
+    """test that sweeper skips run when other process holds lock"""
+    with engine.connect() as conn:
+        assert conn.scalar(select(func.pg_try_advisory_lock(SWEEPER_LOCK_ID)))
+        try:
+            assert client.portal.call(remove_expired_links) is None
+        finally:
+            conn.scalar(select(func.pg_advisory_unlock(SWEEPER_LOCK_ID)))
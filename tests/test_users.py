@@ -1,9 +1,22 @@
+from datetime import timedelta
 from typing import Dict
 
+import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
 
+from jose import jwt
+
+import settings
+import utils.users
 from models.user import User
+from settings import SECRET_KEY, ALGORITHM
+from utils.users import (
+    create_access_token,
+    get_token_data,
+    hashing_executor,
+    user_cache,
+)
 
 from .utils import random_email, random_lower_string
 
@@ -20,6 +33,34 @@ def test_get_users_normal_user_me(
     assert current_user["username"] == "test@test.ru"
 
 
+def test_token_claims(normal_user_token_headers: Dict[str, str]) -> None:
+    token = normal_user_token_headers["Authorization"].split()[1]
+    claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    assert claims["sub"] == "test@test.ru"
+    assert claims["id"]
+    assert claims["is_active"] is True
+    assert claims["is_admin"] is False
+
+
+def test_cached_user_invalidated(
+    client: TestClient, normal_user_token_headers: Dict[str, str], db: Session
+) -> None:
+    response = client.get("/api/users/me", headers=normal_user_token_headers)
+    assert response.status_code == 200
+    user_id = response.json()["id"]
+    assert user_cache.get(user_id).username == "test@test.ru"
+    user = db.query(User).get(user_id)
+    user.is_active = False
+    db.commit()
+    assert user_cache.get(user_id) is None
+    response = client.get("/api/users/me", headers=normal_user_token_headers)
+    assert response.status_code == 400
+    user.is_active = True
+    db.commit()
+    response = client.get("/api/users/me", headers=normal_user_token_headers)
+    assert response.status_code == 200
+
+
 def test_create_user(
     client: TestClient, normal_user_token_headers: dict, db: Session
 ) -> None:
@@ -60,3 +101,39 @@ def test_new_user_login(
     assert "access_token" in data_token
     db.delete(user)
     db.commit()
+
+
+def test_login_hashing_busy(client: TestClient) -> None:
+    max_pending = hashing_executor.max_pending
+    hashing_executor.max_pending = 0
+    try:
+        data = {"username": "test@test.ru", "password": "test"}
+        response = client.post("/api/token", data=data)
+    finally:
+        hashing_executor.max_pending = max_pending
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+
+
+def test_token_cache(
+    normal_user_token_headers: Dict[str, str], monkeypatch
+) -> None:
+    """test that verified token is cached until key rotation and expiration"""
+    token = normal_user_token_headers["Authorization"].split()[1]
+    token_data = get_token_data(token)
+    assert token_data.sub == "test@test.ru"
+
+    def no_decode(token):
+        raise AssertionError("token is decoded again")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(utils.users, "decode_access_token", no_decode)
+        assert get_token_data(token) == token_data
+    with monkeypatch.context() as patch:
+        patch.setattr(settings, "SECRET_KEY", "RotatedKey")
+        with pytest.raises(ValueError):
+            get_token_data(token)
+    assert get_token_data(token) == token_data
+    expired = create_access_token({"sub": "old"}, timedelta(seconds=-1))
+    with pytest.raises(ValueError):
+        get_token_data(expired)
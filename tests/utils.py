@@ -10,8 +10,8 @@ from fastapi.testclient import TestClient
 from settings import SHORT_LINK_EXPIRE_DAYS
 from models.link import Link as LinkModel
 from models.user import User as UserModel
-from utils.links import get_short_url
-from utils.users import get_password_hash
+from utils.links import short_codes
+from utils.users import get_pwd_context
 
 
 def random_lower_string() -> str:
@@ -61,7 +61,7 @@ def create_test_user(db: Session) -> None:
     user_in = UserModel(
         username=email,
         email=email,
-        password=get_password_hash("test")
+        password=get_pwd_context().hash("test")
     )
     db.add(user_in)
     db.commit()
@@ -82,7 +82,7 @@ def create_random_link(db: Session, *, owner_id: Optional[int] = None) -> LinkMo
     text = "http://%s" % random_lower_string()
     item_in = LinkModel(
         text=text,
-        short_text=get_short_url(text),
+        short_text=short_codes.allocate_sync(db)[0],
         expired=datetime.utcnow() + timedelta(days=SHORT_LINK_EXPIRE_DAYS),
         owner_id=owner_id
     )
@@ -0,0 +1,116 @@
+from hashlib import blake2b
+from math import ceil, exp, log
+from threading import Lock
+from typing import Dict, List, Optional
+
+
+class BloomFilter:
+    """
+    Set of strings with false positives but without false negatives.
+    Size is chosen for capacity values and error_rate of false positives,
+    max_bytes limits memory, error rate grows when the limit is reached.
+    """
+
+    def __init__(self, capacity: int, error_rate: float, max_bytes: int):
+        self.capacity = max(capacity, 1)
+        bits = ceil(-self.capacity * log(error_rate) / log(2) ** 2)
+        self.size = max(min(bits, max_bytes * 8), 64)
+        self.hashes = max(round(self.size / self.capacity * log(2)), 1)
+        self.count = 0
+        self._bits = bytearray(ceil(self.size / 8))
+
+    def _positions(self, value: str):
+        digest = blake2b(value.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hashes):
+            yield (first + i * second) % self.size
+
+    def add(self, value: str) -> None:
+        """Adds value to filter"""
+        for position in self._positions(value):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value: str) -> bool:
+        return all(
+            self._bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(value)
+        )
+
+    def error_rate(self) -> float:
+        """Gets expected rate of false positives for added values"""
+        return (1 - exp(-self.hashes * self.count / self.size)) ** self.hashes
+
+    def stats(self) -> Dict:
+        """Gets size and fill of filter"""
+        return {
+            "count": self.count,
+            "capacity": self.capacity,
+            "bytes": len(self._bits),
+            "hashes": self.hashes,
+            "error_rate": self.error_rate(),
+        }
+
+
+class RebuildableBloomFilter:
+    """
+    Bloom filter which is replaced by new one built from storage.
+    Values added while new filter is built are put to both filters.
+    Until the first build filter contains everything.
+    """
+
+    def __init__(self, error_rate: float, max_bytes: int, growth: float = 2.0):
+        self.error_rate = error_rate
+        self.max_bytes = max_bytes
+        self.growth = growth
+        self.rebuilds = 0
+        self._filter: Optional[BloomFilter] = None
+        self._added: Optional[List[str]] = None
+        self._lock = Lock()
+
+    def add(self, value: str) -> None:
+        """Adds value to current filter and to one which is being built"""
+        with self._lock:
+            if self._filter is not None:
+                self._filter.add(value)
+            if self._added is not None:
+                self._added.append(value)
+
+    def __contains__(self, value: str) -> bool:
+        current = self._filter
+        return current is None or value in current
+
+    def start_rebuild(self, count: int) -> BloomFilter:
+        """Gets empty filter with room for growth of count values"""
+        with self._lock:
+            self._added = []
+        return BloomFilter(
+            int(count * self.growth), self.error_rate, self.max_bytes
+        )
+
+    def finish_rebuild(self, new_filter: BloomFilter) -> None:
+        """Replaces current filter by built one"""
+        with self._lock:
+            for value in self._added or ():
+                new_filter.add(value)
+            self._filter = new_filter
+            self._added = None
+            self.rebuilds += 1
+
+    def forget(self) -> None:
+        """Drops current filter, it contains everything until next build"""
+        with self._lock:
+            self._filter = None
+
+    def cancel_rebuild(self) -> None:
+        """Keeps current filter after failed build"""
+        with self._lock:
+            self._added = None
+
+    def stats(self) -> Dict:
+        """Gets stats of current filter"""
+        current = self._filter
+        stats = current.stats() if current is not None else {"count": None}
+        stats["rebuilds"] = self.rebuilds
+        return stats
@@ -0,0 +1,228 @@
+import asyncio
+import logging
+from datetime import date, datetime
+from time import monotonic
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import (
+    Date,
+    DateTime,
+    Integer,
+    LargeBinary,
+    bindparam,
+    column,
+    select,
+    tuple_,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from db import async_engine
+from models.click import LinkClick
+from models.link import Link
+from models.visitor import LinkVisitors
+from settings import CLICKS_FLUSH_EVENTS, HLL_PRECISION
+from .hll import HyperLogLog
+
+
+logger = logging.getLogger(__name__)
+
+# clicks do not start flush for this time after failure, doubled by
+# every next failure, meanwhile flush is retried by periodic task
+FLUSH_RETRY_SECONDS = 1
+FLUSH_RETRY_MAX_SECONDS = 60
+
+
+def visitor_key(host: str, user_agent: str) -> bytes:
+    """Gets identity of visitor for counting unique visitors"""
+    return ("%s\n%s" % (host, user_agent)).encode()
+
+
+class ClickAggregator:
+    """
+    Counts clicks of links per minute and unique visitors per day in memory.
+    Counts are written to database by one statement on flush, which runs
+    by timer or when flush_events clicks are collected. After failed flush
+    clicks do not start another one for growing time.
+    Visitors are counted by HyperLogLog sketches which are merged with
+    stored ones on flush.
+    """
+
+    def __init__(self, flush_events: int, precision: int):
+        self.flush_events = flush_events
+        self.precision = precision
+        self.pending = 0
+        self.flushed = 0
+        self.failures = 0
+        self._retry_at = 0.0
+        self._counts: Dict[Tuple[int, datetime], int] = {}
+        self._visitors: Dict[Tuple[int, date], HyperLogLog] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def record(self, link_id: int, visitor: Optional[bytes] = None) -> None:
+        """Counts one click of link by visitor"""
+        bucket = datetime.utcnow().replace(second=0, microsecond=0)
+        key = (link_id, bucket)
+        self._counts[key] = self._counts.get(key, 0) + 1
+        if visitor is not None:
+            day_key = (link_id, bucket.date())
+            sketch = self._visitors.get(day_key)
+            if sketch is None:
+                sketch = self._visitors[day_key] = HyperLogLog(self.precision)
+            sketch.add(visitor)
+        self.pending += 1
+        if (
+            self.pending >= self.flush_events
+            and self._flush_task is None
+            and self._retry_at <= monotonic()
+        ):
+            self._flush_task = asyncio.get_running_loop().create_task(
+                self._flush_in_background()
+            )
+
+    async def _flush_in_background(self) -> None:
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("Could not flush clicks")
+        finally:
+            self._flush_task = None
+
+    def _restore(
+        self,
+        counts: Dict[Tuple[int, datetime], int],
+        visitors: Dict[Tuple[int, date], HyperLogLog],
+    ) -> None:
+        for key, count in counts.items():
+            self._counts[key] = self._counts.get(key, 0) + count
+            self.pending += count
+        for key, sketch in visitors.items():
+            if key in self._visitors:
+                sketch.merge(self._visitors[key])
+            self._visitors[key] = sketch
+
+    async def flush(self) -> int:
+        """Writes collected counts to database, returns number of clicks"""
+        counts, self._counts = self._counts, {}
+        visitors, self._visitors = self._visitors, {}
+        self.pending = 0
+        if not counts:
+            return 0
+        try:
+            async with async_engine.begin() as conn:
+                await conn.execute(upsert_clicks(counts))
+                if visitors:
+                    await merge_visitors(conn, visitors)
+        except Exception:
+            self._restore(counts, visitors)
+            self.failures += 1
+            self._retry_at = monotonic() + min(
+                FLUSH_RETRY_SECONDS * 2 ** (self.failures - 1),
+                FLUSH_RETRY_MAX_SECONDS,
+            )
+            raise
+        self.failures = 0
+        self._retry_at = 0.0
+        flushed = sum(counts.values())
+        self.flushed += flushed
+        return flushed
+
+
+def upsert_clicks(counts: Dict[Tuple[int, datetime], int]):
+    """
+    Statement which adds counts to rollup, skips deleted links.
+    Rows are locked in the same order by every worker.
+    """
+    rows = values(
+        column("link_id", Integer),
+        column("bucket", DateTime),
+        column("count", Integer),
+        name="clicks",
+    ).data([
+        (link_id, bucket, counts[(link_id, bucket)])
+        for link_id, bucket in sorted(counts)
+    ])
+    statement = insert(LinkClick).from_select(
+        ["link_id", "bucket", "count"],
+        select(rows.c.link_id, rows.c.bucket, rows.c.count)
+        .join(Link, Link.id == rows.c.link_id)
+        .order_by(rows.c.link_id, rows.c.bucket),
+    )
+    return statement.on_conflict_do_update(
+        index_elements=[LinkClick.link_id, LinkClick.bucket],
+        set_={"count": LinkClick.count + statement.excluded.count},
+    )
+
+
+async def merge_visitors(
+    conn: AsyncConnection,
+    visitors: Dict[Tuple[int, date], HyperLogLog],
+) -> None:
+    """
+    Merges sketches to stored ones, skips deleted links.
+    New days are inserted and existing rows are locked in the same order
+    by every worker, existing rows are updated with merged registers.
+    """
+    keys = sorted(visitors)
+    rows = values(
+        column("link_id", Integer),
+        column("day", Date),
+        column("sketch", LargeBinary),
+        name="visitors",
+    ).data([
+        (link_id, day, visitors[(link_id, day)].to_bytes())
+        for link_id, day in keys
+    ])
+    statement = insert(LinkVisitors).from_select(
+        ["link_id", "day", "sketch"],
+        select(rows.c.link_id, rows.c.day, rows.c.sketch)
+        .join(Link, Link.id == rows.c.link_id)
+        .order_by(rows.c.link_id, rows.c.day),
+    ).on_conflict_do_nothing().returning(
+        LinkVisitors.link_id, LinkVisitors.day
+    )
+    result = await conn.execute(statement)
+    inserted = {tuple(row) for row in result}
+    stored_keys = [key for key in keys if key not in inserted]
+    if not stored_keys:
+        return
+    result = await conn.execute(
+        select(LinkVisitors.link_id, LinkVisitors.day, LinkVisitors.sketch)
+        .where(tuple_(LinkVisitors.link_id, LinkVisitors.day).in_(stored_keys))
+        .order_by(LinkVisitors.link_id, LinkVisitors.day)
+        .with_for_update()
+    )
+    merged = []
+    for link_id, day, stored in result:
+        sketch = HyperLogLog.from_bytes(stored)
+        sketch.merge(visitors[(link_id, day)])
+        merged.append(
+            {"b_link_id": link_id, "b_day": day, "b_sketch": sketch.to_bytes()}
+        )
+    if merged:
+        await conn.execute(
+            update(LinkVisitors)
+            .where(
+                LinkVisitors.link_id == bindparam("b_link_id"),
+                LinkVisitors.day == bindparam("b_day"),
+            )
+            .values(sketch=bindparam("b_sketch")),
+            merged,
+        )
+
+
+def count_visitors(sketches) -> int:
+    """Gets approximate number of unique visitors of stored sketches"""
+    total = None
+    for stored in sketches:
+        sketch = HyperLogLog.from_bytes(stored)
+        if total is None:
+            total = sketch
+        else:
+            total.merge(sketch)
+    return total.count() if total is not None else 0
+
+
+click_aggregator = ClickAggregator(CLICKS_FLUSH_EVENTS, HLL_PRECISION)
@@ -0,0 +1,51 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Any, Callable, Optional
+
+
+class ExecutorBusyError(Exception):
+    """Raised when too many tasks wait for executor"""
+
+
+class BoundedExecutor:
+    """
+    Pool of threads for CPU heavy calls from event loop.
+    Refuses new tasks when max_pending tasks are running or waiting.
+    """
+
+    def __init__(self, workers: int, max_pending: int, name: str):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.name = name
+        self.pending = 0
+        self.rejected = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix=self.name
+            )
+        return self._executor
+
+    async def run(self, func: Callable, *args) -> Any:
+        """Runs func in pool, raises ExecutorBusyError when saturated"""
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise ExecutorBusyError(self.name)
+            self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            with self._lock:
+                self.pending -= 1
+
+    def shutdown(self) -> None:
+        """Stops threads, new pool is created on next call"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
@@ -0,0 +1,48 @@
+import csv
+import json
+from io import StringIO
+from typing import AsyncIterator, Sequence
+
+from sqlalchemy.engine import Row
+
+
+EXPORT_COLUMNS = ("id", "text", "short_text", "expired", "owner_id")
+
+
+def _row_values(row: Row) -> list:
+    values = list(row)
+    if values[3] is not None:
+        values[3] = values[3].isoformat()
+    return values
+
+
+def ndjson_chunk(rows: Sequence[Row]) -> str:
+    """Formats rows as lines of JSON objects"""
+    return "".join(
+        json.dumps(dict(zip(EXPORT_COLUMNS, _row_values(row)))) + "\n"
+        for row in rows
+    )
+
+
+def csv_chunk(rows: Sequence[Row], header: bool = False) -> str:
+    """Formats rows as CSV lines"""
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    writer.writerows(_row_values(row) for row in rows)
+    return buffer.getvalue()
+
+
+async def export_rows(
+    partitions: AsyncIterator[Sequence[Row]],
+    export_format: str,
+) -> AsyncIterator[str]:
+    """Formats chunks of rows from server-side cursor one by one"""
+    if export_format == "csv":
+        yield csv_chunk([], header=True)
+        async for rows in partitions:
+            yield csv_chunk(rows)
+    else:
+        async for rows in partitions:
+            yield ndjson_chunk(rows)
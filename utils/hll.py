@@ -0,0 +1,121 @@
+from hashlib import blake2b
+from math import log
+from typing import Dict, Optional
+
+
+class HyperLogLog:
+    """
+    Sketch for approximate count of unique values in fixed memory.
+    Holds 2 ** precision one-byte registers, standard error is
+    1.04 / sqrt(2 ** precision). Few values are kept in sparse dict
+    until it becomes bigger than dense registers.
+    """
+
+    def __init__(self, precision: int, registers: Optional[bytes] = None):
+        self.precision = precision
+        self.size = 1 << precision
+        self._sparse: Optional[Dict[int, int]] = None
+        self._registers: Optional[bytearray] = None
+        if registers is None:
+            self._sparse = {}
+        elif len(registers) != self.size:
+            raise ValueError("Sketch has %s registers" % len(registers))
+        else:
+            self._registers = bytearray(registers)
+
+    @classmethod
+    def from_bytes(cls, registers: bytes) -> "HyperLogLog":
+        """Loads sketch saved by to_bytes"""
+        return cls(len(registers).bit_length() - 1, registers)
+
+    def add(self, value: bytes) -> None:
+        """Adds value to sketch"""
+        hashed = int.from_bytes(blake2b(value, digest_size=8).digest(), "big")
+        bits = 64 - self.precision
+        index = hashed >> bits
+        rank = bits - (hashed & ((1 << bits) - 1)).bit_length() + 1
+        if self._sparse is not None:
+            if rank > self._sparse.get(index, 0):
+                self._sparse[index] = rank
+                if len(self._sparse) > self.size >> 7:
+                    self._densify()
+        elif rank > self._registers[index]:
+            self._registers[index] = rank
+
+    def _densify(self) -> None:
+        registers = bytearray(self.size)
+        for index, rank in self._sparse.items():
+            registers[index] = rank
+        self._registers = registers
+        self._sparse = None
+
+    def fold(self, precision: int) -> "HyperLogLog":
+        """
+        Gets the same sketch with lower precision, it equals sketch
+        which got the same values with that precision
+        """
+        if precision > self.precision:
+            raise ValueError("Precision of sketch can not grow")
+        if precision == self.precision:
+            return self
+        shift = self.precision - precision
+        if self._sparse is not None:
+            items = self._sparse.items()
+        else:
+            items = ((index, rank) for index, rank in enumerate(self._registers))
+        registers = bytearray(1 << precision)
+        for index, rank in items:
+            if not rank:
+                continue
+            # low bits of index become the first bits counted by rank
+            low = index & ((1 << shift) - 1)
+            rank = shift - low.bit_length() + 1 if low else shift + rank
+            if rank > registers[index >> shift]:
+                registers[index >> shift] = rank
+        return HyperLogLog(precision, bytes(registers))
+
+    def merge(self, other: "HyperLogLog") -> None:
+        """
+        Adds all values of other sketch.
+        Sketches of different precision are merged with the lower one.
+        """
+        if other.precision > self.precision:
+            other = other.fold(self.precision)
+        elif other.precision < self.precision:
+            folded = self.fold(other.precision)
+            self.precision = folded.precision
+            self.size = folded.size
+            self._sparse = None
+            self._registers = folded._registers
+        if self._sparse is not None:
+            self._densify()
+        if other._sparse is not None:
+            for index, rank in other._sparse.items():
+                if rank > self._registers[index]:
+                    self._registers[index] = rank
+        else:
+            self._registers = bytearray(
+                map(max, self._registers, other._registers)
+            )
+
+    def to_bytes(self) -> bytes:
+        """Gets registers for storing in database"""
+        if self._sparse is not None:
+            self._densify()
+        return bytes(self._registers)
+
+    def count(self) -> int:
+        """Gets approximate number of unique values"""
+        if self._sparse is not None:
+            ranks = list(self._sparse.values())
+            zeros = self.size - len(ranks)
+        else:
+            ranks = self._registers
+            zeros = ranks.count(0)
+        alpha = 0.7213 / (1 + 1.079 / self.size)
+        inverse_sum = zeros + sum(2.0 ** -rank for rank in ranks if rank)
+        estimate = alpha * self.size * self.size / inverse_sum
+        if estimate <= 2.5 * self.size and zeros:
+            # linear counting is more precise for small cardinalities
+            estimate = self.size * log(self.size / zeros)
+        return round(estimate)
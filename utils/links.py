@@ -1,21 +1,392 @@
+import json
+import logging
+from base64 import urlsafe_b64decode, urlsafe_b64encode
 from datetime import datetime
-from pydantic import AnyUrl
-from hashids import Hashids
+from time import monotonic, time
+from typing import Dict, List, NamedTuple, Optional
 
-from sqlalchemy import delete
+from sqlalchemy import BigInteger, delete, func, literal, or_, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from models.link import Link
-from routers import deps
+from models.link import Link, short_code_seq
+from db import async_engine
+from settings import (
+    SWEEPER_CHUNK_SIZE,
+    SWEEPER_LOCK_ID,
+    SWEEPER_TIME_BUDGET_SECONDS,
+    REDIRECT_CACHE_SIZE,
+    REDIRECT_CACHE_TTL_SECONDS,
+    SHORT_CODE_ALPHABET,
+    SHORT_CODE_BLOCK_SIZE,
+    SHORT_CODE_MIN_LENGTH,
+    SHORT_CODE_SALT,
+    BLOOM_FILTER,
+    BLOOM_ERROR_RATE,
+    BLOOM_MAX_BYTES,
+    EXPORT_CHUNK_SIZE,
+    SHARED_CACHE_URL,
+    SHARED_CACHE_PREFIX,
+    SHARED_CACHE_TTL_SECONDS,
+    SHARED_CACHE_TIMEOUT_MS,
+    SHARED_CACHE_RETRY_SECONDS,
+    SHARED_CACHE_TOMBSTONE_SECONDS,
+    SHARED_TABLE,
+    SHARED_TABLE_NAME,
+    SHARED_TABLE_CAPACITY,
+    SHARED_TABLE_ARENA_BYTES,
+    SHARED_TABLE_REFRESH_SECONDS,
+)
+from .bloom import RebuildableBloomFilter
+from .cache import TTLLRUCache
+from .shared_cache import SharedCache
+from .shared_table import SharedRedirectTable
+from .short_codes import ShortCodeAllocator
 
 
-def get_short_url(long_url: AnyUrl):
-    """Creates short link from a long link"""
-    hashids = Hashids(long_url)
-    return hashids.encode(123456)
+logger = logging.getLogger(__name__)
 
 
-def remove_expired_links():
-    """Removes all link objects in database if date expired"""
-    db = deps.get_db()
-    statement = delete(Link).where(Link.expired < datetime.utcnow())
-    db.execute(statement=statement)
+class RedirectEntry(NamedTuple):
+    """Cached data for redirect by short link"""
+    id: int
+    text: str
+    expired: Optional[datetime]
+
+
+class SweepResult(NamedTuple):
+    """Report of one run of expired links sweeper"""
+    removed: int
+    duration: float
+    finished: bool
+
+
+# columns of link in responses of API
+LINK_COLUMNS = (Link.id, Link.text, Link.short_text, Link.expired, Link.owner_id)
+
+redirect_cache = TTLLRUCache(REDIRECT_CACHE_SIZE, REDIRECT_CACHE_TTL_SECONDS)
+shared_cache = SharedCache(
+    SHARED_CACHE_URL,
+    prefix=SHARED_CACHE_PREFIX,
+    timeout=SHARED_CACHE_TIMEOUT_MS / 1000,
+    retry_seconds=SHARED_CACHE_RETRY_SECONDS,
+    tombstone_seconds=SHARED_CACHE_TOMBSTONE_SECONDS,
+)
+INVALIDATION_CHANNEL = SHARED_CACHE_PREFIX + "invalidate"
+redirect_table = SharedRedirectTable(
+    SHARED_TABLE_NAME,
+    capacity=SHARED_TABLE_CAPACITY,
+    arena_bytes=SHARED_TABLE_ARENA_BYTES,
+    max_age=3 * SHARED_TABLE_REFRESH_SECONDS,
+)
+# unix time of changes of short links, table loaded before them is stale
+table_invalidations: Dict[str, float] = {}
+TABLE_INVALIDATIONS_LIMIT = 10000
+EPOCH = datetime(1970, 1, 1)
+MAX_LINK_ID = 2 ** 31 - 1
+short_codes = ShortCodeAllocator(
+    short_code_seq,
+    block_size=SHORT_CODE_BLOCK_SIZE,
+    salt=SHORT_CODE_SALT,
+    min_length=SHORT_CODE_MIN_LENGTH,
+    alphabet=SHORT_CODE_ALPHABET,
+)
+short_code_filter = RebuildableBloomFilter(BLOOM_ERROR_RATE, BLOOM_MAX_BYTES)
+sweeper_stats = {
+    "runs": 0,
+    "skipped": 0,
+    "removed": 0,
+    "last_removed": 0,
+    "last_duration": 0.0,
+}
+
+
+async def get_short_url(db: AsyncSession) -> str:
+    """Gets new unique short link"""
+    codes = await short_codes.allocate(db)
+    return codes[0]
+
+
+def rows_to_dicts(result) -> List[Dict]:
+    """Gets rows of Core result as dicts for JSON response"""
+    keys = list(result.keys())
+    return [dict(zip(keys, row)) for row in result.all()]
+
+
+def encode_cursor(link_id: int) -> str:
+    """Makes opaque cursor for pagination after link with link_id"""
+    return urlsafe_b64encode(b"id:%d" % link_id).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    """Gets link id from cursor, raises ValueError for broken cursor"""
+    value = urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+    prefix, _, link_id = value.partition(b":")
+    if prefix != b"id":
+        raise ValueError("Invalid cursor")
+    link_id = int(link_id)
+    # ids are integer column of database
+    if not 0 < link_id <= MAX_LINK_ID:
+        raise ValueError("Invalid cursor")
+    return link_id
+
+
+def upsert_links(values: List[Dict]):
+    """
+    Statement which inserts links and returns them.
+    For long links which already exist returns stored rows
+    and generated short links are thrown away.
+    """
+    statement = insert(Link).values(values)
+    return statement.on_conflict_do_update(
+        index_elements=[Link.text_digest],
+        set_={"text_digest": statement.excluded.text_digest},
+    ).returning(*LINK_COLUMNS)
+
+
+def redirect_ttl(entry: RedirectEntry, ttl: float) -> float:
+    """Shortens ttl of cached redirect, so it never outlives the link"""
+    if entry.expired is None:
+        return ttl
+    return min(ttl, (entry.expired - datetime.utcnow()).total_seconds())
+
+
+def cache_redirect(link: Link) -> RedirectEntry:
+    """Puts link to redirect cache, entry never outlives the link"""
+    entry = RedirectEntry(link.id, link.text, link.expired)
+    redirect_cache.set(
+        link.short_text, entry, redirect_ttl(entry, REDIRECT_CACHE_TTL_SECONDS)
+    )
+    return entry
+
+
+async def get_shared_redirect(short_text: str) -> Optional[RedirectEntry]:
+    """Gets redirect from shared cache and puts it to local one"""
+    if not shared_cache.enabled:
+        return None
+    value = await shared_cache.get(short_text)
+    if value is None:
+        return None
+    link_id, text, expired = json.loads(value)
+    entry = RedirectEntry(
+        link_id, text, datetime.fromisoformat(expired) if expired else None
+    )
+    redirect_cache.set(
+        short_text, entry, redirect_ttl(entry, REDIRECT_CACHE_TTL_SECONDS)
+    )
+    return entry
+
+
+async def share_redirect(short_text: str, entry: RedirectEntry) -> None:
+    """Puts redirect loaded from database to shared cache"""
+    if not shared_cache.enabled:
+        return
+    value = json.dumps([
+        entry.id, entry.text, entry.expired.isoformat() if entry.expired else None
+    ])
+    await shared_cache.set(
+        short_text, value.encode(), redirect_ttl(entry, SHARED_CACHE_TTL_SECONDS)
+    )
+
+
+async def invalidate_redirects(*short_texts: str) -> None:
+    """
+    Drops changed or deleted links from redirect caches of this process,
+    shared cache and, by published message, of other processes
+    """
+    for short_text in short_texts:
+        redirect_cache.pop(short_text)
+    skip_table_redirects(*short_texts)
+    if shared_cache.enabled:
+        await shared_cache.invalidate(
+            INVALIDATION_CHANNEL, sorted(set(short_texts))
+        )
+
+
+def on_redirect_invalidated(short_text: str) -> None:
+    """Handles link changed by other process"""
+    redirect_cache.pop(short_text)
+    skip_table_redirects(short_text)
+    remember_short_text(short_text)
+
+
+def get_table_redirect(short_text: str) -> Optional[RedirectEntry]:
+    """Gets redirect from table in shared memory of host"""
+    if not SHARED_TABLE:
+        return None
+    changed_at = table_invalidations.get(short_text)
+    if changed_at is not None:
+        if redirect_table.loaded_at() <= changed_at:
+            return None
+        table_invalidations.pop(short_text, None)
+    found = redirect_table.get(short_text)
+    if found is None:
+        return None
+    link_id, text, expiry = found
+    if expiry and expiry <= time():
+        return None
+    return RedirectEntry(
+        link_id, text, datetime.utcfromtimestamp(expiry) if expiry else None
+    )
+
+
+def skip_table_redirects(*short_texts: str) -> None:
+    """Ignores changed links in shared table until it is loaded again"""
+    if not SHARED_TABLE:
+        return
+    if len(table_invalidations) > TABLE_INVALIDATIONS_LIMIT:
+        loaded_at = redirect_table.loaded_at()
+        for short_text, changed_at in list(table_invalidations.items()):
+            if changed_at < loaded_at:
+                del table_invalidations[short_text]
+    now = time()
+    for short_text in short_texts:
+        table_invalidations[short_text] = now
+
+
+async def load_redirect_table() -> int:
+    """
+    Builds new table of redirects in shared memory from database.
+    Newest links are loaded when all of them do not fit.
+    """
+    redirect_table.start_build()
+    async with async_engine.connect() as conn:
+        result = await conn.stream(
+            select(Link.short_text, Link.text, Link.id, Link.expired)
+            .where(
+                Link.short_text.isnot(None),
+                Link.text.isnot(None),
+                or_(Link.expired.is_(None), Link.expired > datetime.utcnow()),
+            )
+            .order_by(Link.id.desc())
+            .execution_options(yield_per=EXPORT_CHUNK_SIZE)
+        )
+        full = False
+        async for rows in result.partitions():
+            for short_text, text, link_id, expired in rows:
+                expiry = (expired - EPOCH).total_seconds() if expired else 0.0
+                if not redirect_table.add(short_text, text, link_id, expiry):
+                    full = True
+                    break
+            if full:
+                await result.close()
+                break
+    count = redirect_table.finish_build()
+    if full:
+        logger.warning("Shared table is full, loaded %s newest links", count)
+    return count
+
+
+def on_invalidations_lost() -> None:
+    """Drops everything which could miss changes of other processes"""
+    redirect_cache.clear()
+    short_code_filter.forget()
+
+
+def start_invalidation_listener() -> None:
+    """Subscribes redirect cache to invalidations of other processes"""
+    shared_cache.start_listener(
+        INVALIDATION_CHANNEL, on_redirect_invalidated, on_invalidations_lost
+    )
+
+
+def remember_short_text(short_text: str) -> None:
+    """Adds created or changed short link to filter of existing ones"""
+    short_code_filter.add(short_text)
+
+
+def is_unknown_short_text(short_text: str) -> bool:
+    """
+    Checks without database that short link surely does not exist.
+    Generated codes are always checked in database because
+    other processes create them after the filter was built.
+    """
+    return (
+        BLOOM_FILTER
+        and short_text not in short_code_filter
+        and short_codes.decode(short_text) is None
+    )
+
+
+async def load_short_code_filter() -> None:
+    """Builds new filter of short links by streaming them from database"""
+    async with async_engine.connect() as conn:
+        count = await conn.scalar(select(func.count()).select_from(Link))
+        new_filter = short_code_filter.start_rebuild(count)
+        try:
+            result = await conn.stream(
+                select(Link.short_text)
+                .where(Link.short_text.isnot(None))
+                .execution_options(yield_per=EXPORT_CHUNK_SIZE)
+            )
+            async for short_texts in result.scalars().partitions():
+                for short_text in short_texts:
+                    new_filter.add(short_text)
+        except Exception:
+            short_code_filter.cancel_rebuild()
+            raise
+    short_code_filter.finish_rebuild(new_filter)
+    logger.info("Loaded %s short links to filter", new_filter.count)
+
+
+def _delete_expired_chunk(now: datetime):
+    """Deletes one chunk of expired links and returns their short links"""
+    expired_ids = (
+        select(Link.id)
+        .where(Link.expired < now)
+        .limit(SWEEPER_CHUNK_SIZE)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    return delete(Link).where(Link.id.in_(expired_ids)).returning(
+        Link.short_text
+    )
+
+
+async def remove_expired_links() -> Optional[SweepResult]:
+    """
+    Removes link objects in database if date expired.
+    Works only in process which holds advisory lock, deletes links
+    by chunks and stops when time budget is over.
+    Returns None when other process is sweeping.
+    """
+    started = monotonic()
+    now = datetime.utcnow()
+    lock_id = literal(SWEEPER_LOCK_ID, BigInteger)
+    removed = 0
+    finished = False
+    async with async_engine.connect() as conn:
+        is_leader = await conn.scalar(
+            select(func.pg_try_advisory_lock(lock_id))
+        )
+        await conn.commit()
+        if not is_leader:
+            sweeper_stats["skipped"] += 1
+            return None
+        try:
+            while monotonic() - started < SWEEPER_TIME_BUDGET_SECONDS:
+                result = await conn.execute(_delete_expired_chunk(now))
+                short_texts = result.scalars().all()
+                await conn.commit()
+                for short_text in short_texts:
+                    redirect_cache.pop(short_text)
+                removed += len(short_texts)
+                if len(short_texts) < SWEEPER_CHUNK_SIZE:
+                    finished = True
+                    break
+        finally:
+            await conn.execute(select(func.pg_advisory_unlock(lock_id)))
+            await conn.commit()
+    redirect_cache.purge()
+    sweep = SweepResult(removed, monotonic() - started, finished)
+    sweeper_stats["runs"] += 1
+    sweeper_stats["removed"] += sweep.removed
+    sweeper_stats["last_removed"] = sweep.removed
+    sweeper_stats["last_duration"] = sweep.duration
+    logger.info(
+        "Removed %s expired links in %.3f s%s",
+        sweep.removed,
+        sweep.duration,
+        "" if finished else ", time budget is over",
+    )
+    return sweep
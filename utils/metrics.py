@@ -0,0 +1,290 @@
+import os
+from bisect import bisect_left
+from functools import wraps
+from time import perf_counter, time
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+# charset is added by response
+CONTENT_TYPE = "text/plain; version=0.0.4"
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5
+)
+STATEMENT_TYPES = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH"}
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def _format_labels(names: Sequence[str], values: Sequence) -> str:
+    if not names:
+        return ""
+    return "{%s}" % ",".join(
+        '%s="%s"' % (name, _escape(value)) for name, value in zip(names, values)
+    )
+
+
+class Metric:
+    """Base of metrics with values for tuples of label values"""
+
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+
+    def samples(self) -> List[Tuple[str, tuple, tuple, float]]:
+        """Gets suffix, label names, label values and value of every sample"""
+        raise NotImplementedError
+
+    def render(self, const_labels: Sequence[Tuple[str, str]] = ()) -> List[str]:
+        """Gets lines of metric in text exposition format"""
+        const_names = tuple(name for name, _ in const_labels)
+        const_values = tuple(value for _, value in const_labels)
+        lines = [
+            "# HELP %s %s" % (self.name, self.help),
+            "# TYPE %s %s" % (self.name, self.type),
+        ]
+        for suffix, names, labels, value in self.samples():
+            lines.append("%s%s%s %r" % (
+                self.name,
+                suffix,
+                _format_labels(const_names + names, const_values + labels),
+                float(value),
+            ))
+        return lines
+
+
+class Counter(Metric):
+    """Value which only grows"""
+
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        """Adds amount to counter with label values"""
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def set(self, value: float, *labels) -> None:
+        """Sets value with label values, counter takes it from other counter"""
+        self._values[labels] = value
+
+    def samples(self):
+        return [
+            ("", self.labelnames, labels, value)
+            for labels, value in sorted(self._values.items())
+        ]
+
+
+class Gauge(Counter):
+    """Value which is set to current state"""
+
+    type = "gauge"
+
+
+class Histogram(Metric):
+    """Counts of observed values by buckets with sum of values"""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+        # counts per bucket without accumulation, last one is +Inf
+        self._counts: Dict[tuple, List[int]] = {}
+        self._sums: Dict[tuple, float] = {}
+
+    def observe(self, value: float, *labels) -> None:
+        """Counts value for label values"""
+        counts = self._counts.get(labels)
+        if counts is None:
+            counts = self._counts[labels] = [0] * (len(self.buckets) + 1)
+            self._sums[labels] = 0.0
+        counts[bisect_left(self.buckets, value)] += 1
+        self._sums[labels] += value
+
+    def samples(self):
+        samples = []
+        for labels, counts in sorted(self._counts.items()):
+            total = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                total += count
+                samples.append((
+                    "_bucket", self.labelnames + ("le",), labels + (bound,), total
+                ))
+            samples.append(("_sum", self.labelnames, labels, self._sums[labels]))
+            samples.append(("_count", self.labelnames, labels, total))
+        return samples
+
+
+class Registry:
+    """
+    Metrics of process which are rendered for /metrics.
+    Every sample has label worker with id of process, so counters of
+    workers behind one address stay separate series.
+    """
+
+    def __init__(self):
+        self.metrics: List[Metric] = []
+        self._collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        """Adds metric to output"""
+        self.metrics.append(metric)
+        return metric
+
+    def on_collect(self, func: Callable[[], None]) -> Callable[[], None]:
+        """Adds function which sets gauges before rendering"""
+        self._collectors.append(func)
+        return func
+
+    def render(self) -> str:
+        """Gets all metrics in text exposition format"""
+        for collect in self._collectors:
+            collect()
+        # id is taken at render time, workers are forked after import
+        const_labels = (("worker", str(os.getpid())),)
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render(const_labels))
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+http_requests = registry.register(Counter(
+    "http_requests_total",
+    "Requests by method, route template and status.",
+    ("method", "route", "status"),
+))
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds",
+    "Latency of requests by method and route template.",
+    ("method", "route"),
+))
+db_query_duration = registry.register(Histogram(
+    "db_query_duration_seconds",
+    "Latency of database statements by type.",
+    ("statement",),
+))
+task_runs = registry.register(Counter(
+    "background_task_runs_total",
+    "Runs of background tasks.",
+    ("task",),
+))
+task_failures = registry.register(Counter(
+    "background_task_failures_total",
+    "Failed runs of background tasks.",
+    ("task",),
+))
+task_last_duration = registry.register(Gauge(
+    "background_task_last_duration_seconds",
+    "Duration of the last run of background task.",
+    ("task",),
+))
+task_last_success = registry.register(Gauge(
+    "background_task_last_success_timestamp_seconds",
+    "Unix time of the last successful run of background task.",
+    ("task",),
+))
+
+
+class MetricsMiddleware:
+    """
+    Counts requests and their latency by route template,
+    so short links do not make new series.
+    Requests served before routing are labeled by scope["route_path"].
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        started = perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            if route is not None:
+                route_path = route.path
+            else:
+                route_path = scope.get("route_path", "unmatched")
+            method = scope["method"]
+            http_request_duration.observe(
+                perf_counter() - started, method, route_path
+            )
+            http_requests.inc(method, route_path, status)
+
+
+def get_statement_type(statement: str) -> str:
+    """Gets first keyword of SQL statement for labels"""
+    words = statement.lstrip()[:7].split(None, 1)
+    keyword = words[0].upper() if words else ""
+    return keyword if keyword in STATEMENT_TYPES else "OTHER"
+
+
+def instrument_queries(engine: Engine) -> None:
+    """Measures latency of statements executed by engine"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(
+        conn, cursor, statement, parameters, context, executemany
+    ):
+        conn.info["query_started"] = perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(
+        conn, cursor, statement, parameters, context, executemany
+    ):
+        started = conn.info.pop("query_started", None)
+        if started is not None:
+            db_query_duration.observe(
+                perf_counter() - started, get_statement_type(statement)
+            )
+
+
+def track_task(name: str):
+    """Decorator which counts runs, failures and duration of async task"""
+
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            started = perf_counter()
+            try:
+                result = await func(*args, **kwargs)
+            except Exception:
+                task_failures.inc(name)
+                raise
+            else:
+                task_last_success.set(time(), name)
+                return result
+            finally:
+                task_runs.inc(name)
+                task_last_duration.set(perf_counter() - started, name)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,131 @@
+from typing import Optional, Set
+from urllib.parse import quote
+
+from sqlalchemy import bindparam, exc, select
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from db import replica_router
+from models.link import Link
+from .clicks import click_aggregator, visitor_key
+from .links import (
+    RedirectEntry,
+    cache_redirect,
+    get_shared_redirect,
+    get_table_redirect,
+    is_unknown_short_text,
+    redirect_cache,
+    share_redirect,
+)
+
+
+# statement is compiled once, only driver executes it for every redirect
+REDIRECT_SQL = str(
+    select(Link.id, Link.text, Link.expired, Link.short_text)
+    .where(Link.short_text == bindparam("short_text"))
+    .compile(dialect=replica_router.primary.dialect)
+)
+NOT_FOUND_BODY = b'{"detail":"Link not found"}'
+NOT_FOUND_START = {
+    "type": "http.response.start",
+    "status": 404,
+    "headers": [
+        (b"content-length", b"%d" % len(NOT_FOUND_BODY)),
+        (b"content-type", b"application/json"),
+    ],
+}
+NOT_FOUND_BODY_MESSAGE = {"type": "http.response.body", "body": NOT_FOUND_BODY}
+EMPTY_BODY_MESSAGE = {"type": "http.response.body", "body": b""}
+LOCATION_SAFE = ":/%#?=@[]!$&'()*+,;"
+
+
+async def select_redirect(engine: AsyncEngine, short_text: str):
+    """Gets row of link by short link, failed replica is skipped for a while"""
+    try:
+        async with engine.connect() as conn:
+            result = await conn.exec_driver_sql(REDIRECT_SQL, (short_text,))
+            return result.first()
+    except (exc.OperationalError, exc.InterfaceError, OSError):
+        replica_router.mark_unhealthy(engine)
+        raise
+
+
+async def find_redirect(short_text: str) -> Optional[RedirectEntry]:
+    """Gets redirect by short link from caches or database"""
+    entry = redirect_cache.get(short_text)
+    if entry is None:
+        entry = get_table_redirect(short_text)
+    if entry is not None:
+        return entry
+    if is_unknown_short_text(short_text):
+        return None
+    entry = await get_shared_redirect(short_text)
+    if entry is not None:
+        return entry
+    engine = replica_router.get_engine()
+    row = await select_redirect(engine, short_text)
+    if row is None and engine is not replica_router.primary:
+        # replica may not have link created moments ago
+        row = await select_redirect(replica_router.primary, short_text)
+    if row is None:
+        return None
+    entry = cache_redirect(row)
+    await share_redirect(short_text, entry)
+    return entry
+
+
+class FastRedirectMiddleware:
+    """
+    Serves GET /{short_text} before routing of application.
+    Redirect is written by raw ASGI messages without dependencies,
+    ORM objects and response classes. Other requests and paths of
+    application routes without parameters go to application.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._reserved: Optional[Set[str]] = None
+
+    def is_reserved(self, scope, path: str) -> bool:
+        """Checks that path belongs to other route of application"""
+        if self._reserved is None:
+            routes = getattr(scope.get("app"), "routes", [])
+            self._reserved = {
+                route.path for route in routes
+                if "{" not in getattr(route, "path", "{")
+            }
+        return path in self._reserved
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            return await self.app(scope, receive, send)
+        path = scope["path"]
+        short_text = path[1:]
+        if not short_text or "/" in short_text or self.is_reserved(scope, path):
+            return await self.app(scope, receive, send)
+        scope["route_path"] = "/{short_text}"
+        entry = await find_redirect(short_text)
+        if entry is None:
+            await send(NOT_FOUND_START)
+            await send(NOT_FOUND_BODY_MESSAGE)
+            return
+        user_agent = b""
+        for name, value in scope["headers"]:
+            if name == b"user-agent":
+                user_agent = value
+                break
+        client = scope.get("client")
+        click_aggregator.record(entry.id, visitor_key(
+            client[0] if client else "", user_agent.decode("latin-1")
+        ))
+        await send({
+            "type": "http.response.start",
+            "status": 307,
+            "headers": [
+                (b"content-length", b"0"),
+                (
+                    b"location",
+                    quote(entry.text, safe=LOCATION_SAFE).encode("latin-1"),
+                ),
+            ],
+        })
+        await send(EMPTY_BODY_MESSAGE)
@@ -0,0 +1,82 @@
+import asyncio
+import logging
+from time import monotonic
+from typing import List
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+logger = logging.getLogger(__name__)
+
+
+class ReplicaRouter:
+    """
+    Chooses engine for read-only queries.
+    Replicas are used by round-robin, replica which failed is skipped
+    for retry_seconds. Without healthy replicas primary is used.
+    """
+
+    def __init__(
+        self,
+        primary: AsyncEngine,
+        replicas: List[AsyncEngine],
+        retry_seconds: float,
+        check_timeout: float,
+    ):
+        self.primary = primary
+        self.replicas = replicas
+        self.retry_seconds = retry_seconds
+        self.check_timeout = check_timeout
+        self._unhealthy_until = [0.0] * len(replicas)
+        self._next = 0
+
+    def get_engine(self) -> AsyncEngine:
+        """Gets next healthy replica or primary"""
+        now = monotonic()
+        for _ in range(len(self.replicas)):
+            index = self._next
+            self._next = (index + 1) % len(self.replicas)
+            if self._unhealthy_until[index] <= now:
+                return self.replicas[index]
+        return self.primary
+
+    def mark_unhealthy(self, engine: AsyncEngine) -> None:
+        """Skips replica for retry_seconds"""
+        if engine in self.replicas:
+            index = self.replicas.index(engine)
+            self._unhealthy_until[index] = monotonic() + self.retry_seconds
+            logger.warning("Replica %s is unhealthy", engine.url)
+
+    def healthy_replicas(self) -> List[AsyncEngine]:
+        """Gets replicas which are used now"""
+        now = monotonic()
+        return [
+            engine for engine, until in zip(self.replicas, self._unhealthy_until)
+            if until <= now
+        ]
+
+    @staticmethod
+    async def _ping(engine: AsyncEngine) -> None:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    async def _check(self, index: int) -> None:
+        engine = self.replicas[index]
+        try:
+            await asyncio.wait_for(self._ping(engine), self.check_timeout)
+        except Exception:
+            self.mark_unhealthy(engine)
+        else:
+            self._unhealthy_until[index] = 0.0
+
+    async def check_health(self) -> None:
+        """Checks all replicas, healthy ones are used again"""
+        await asyncio.gather(
+            *(self._check(index) for index in range(len(self.replicas)))
+        )
+
+    async def dispose(self) -> None:
+        """Closes connections of replicas"""
+        for engine in self.replicas:
+            await engine.dispose()
@@ -0,0 +1,19 @@
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+
+def dump_json(content: Any) -> bytes:
+    """Serializes content with datetimes in ISO format"""
+    return orjson.dumps(content)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response which is serialized in one pass by orjson
+    without validation.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dump_json(content)
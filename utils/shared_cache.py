@@ -0,0 +1,356 @@
+import asyncio
+import logging
+from collections import deque
+from itertools import count
+from time import monotonic
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import unquote, urlparse
+
+
+logger = logging.getLogger(__name__)
+
+# failures after which shared cache is skipped for retry_seconds
+FAILURES = (OSError, EOFError, asyncio.TimeoutError)
+# value of invalidated key, it is never returned to callers
+TOMBSTONE = b""
+# invalidations kept while cache does not answer, the oldest are dropped
+INVALIDATIONS_LIMIT = 10000
+
+
+class RespError(Exception):
+    """Error reply of server"""
+
+
+def encode_command(args: Iterable) -> bytes:
+    """Encodes command as RESP array of bulk strings"""
+    parts = []
+    for arg in args:
+        if isinstance(arg, str):
+            arg = arg.encode()
+        elif isinstance(arg, int):
+            arg = b"%d" % arg
+        parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"*%d\r\n%s" % (len(parts), b"".join(parts))
+
+
+async def read_reply(reader: asyncio.StreamReader) -> Any:
+    """Reads one reply, error replies are returned as RespError"""
+    line = await reader.readuntil(b"\r\n")
+    kind, value = line[:1], line[1:-2]
+    if kind == b"+":
+        return value
+    if kind == b"-":
+        return RespError(value.decode(errors="replace"))
+    if kind == b":":
+        return int(value)
+    if kind == b"$":
+        if int(value) < 0:
+            return None
+        data = await reader.readexactly(int(value) + 2)
+        return data[:-2]
+    if kind == b"*":
+        if int(value) < 0:
+            return None
+        return [await read_reply(reader) for _ in range(int(value))]
+    raise ConnectionError("Broken reply %r" % line[:32])
+
+
+async def open_connection(
+    url: str, timeout: float
+) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+    """Opens connection by URL like redis://:password@host:6379/0"""
+    parts = urlparse(url)
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(parts.hostname or "localhost", parts.port or 6379),
+        timeout,
+    )
+    commands = []
+    if parts.password:
+        commands.append(("AUTH", unquote(parts.password)))
+    database = parts.path.strip("/")
+    if database and database != "0":
+        commands.append(("SELECT", database))
+    try:
+        for command in commands:
+            writer.write(encode_command(command))
+            reply = await asyncio.wait_for(read_reply(reader), timeout)
+            if isinstance(reply, RespError):
+                raise reply
+    except BaseException:
+        writer.close()
+        raise
+    return reader, writer
+
+
+class RespClient:
+    """
+    Connection to server speaking Redis protocol.
+    Commands are pipelined: they are written at once and replies
+    are given to waiting callers in order of commands.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.closed = False
+        self._reader = reader
+        self._writer = writer
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._reading = asyncio.ensure_future(self._read_replies())
+
+    @classmethod
+    async def connect(cls, url: str, timeout: float) -> "RespClient":
+        return cls(*await open_connection(url, timeout))
+
+    async def execute(self, *args) -> Any:
+        """Runs command, raises RespError for error reply"""
+        if self.closed:
+            raise ConnectionError("Connection is closed")
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._writer.write(encode_command(args))
+        return await waiter
+
+    async def _read_replies(self) -> None:
+        try:
+            while True:
+                reply = await read_reply(self._reader)
+                waiter = self._waiters.popleft()
+                # caller could stop waiting by timeout
+                if waiter.done():
+                    continue
+                if isinstance(reply, RespError):
+                    waiter.set_exception(reply)
+                else:
+                    waiter.set_result(reply)
+        except Exception as error:
+            self._shutdown(ConnectionError("Connection is lost: %r" % error))
+
+    def _shutdown(self, error: Exception) -> None:
+        self.closed = True
+        self._writer.close()
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_exception(error)
+
+    def close(self) -> None:
+        """Closes connection, waiting commands fail"""
+        if not self.closed:
+            self._reading.cancel()
+            self._shutdown(ConnectionError("Connection is closed"))
+
+
+class SharedCache:
+    """
+    Optional cache shared by processes and hosts in server speaking
+    Redis protocol. Any failure makes it unavailable for retry_seconds,
+    meanwhile reads miss and writes are skipped, so callers fall back
+    to their own caches and database. Invalidations are tried always,
+    failed ones are kept and sent again when cache answers.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        prefix: str,
+        timeout: float,
+        retry_seconds: float,
+        tombstone_seconds: float = 5,
+    ):
+        self.url = url
+        self.prefix = prefix
+        self.timeout = timeout
+        self.retry_seconds = retry_seconds
+        self.tombstone_seconds = tombstone_seconds
+        self.reset()
+
+    def reset(self) -> None:
+        """Forgets connections and counters, they are not closed"""
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._down_until = 0.0
+        self._client: Optional[RespClient] = None
+        self._connecting: Optional[asyncio.Lock] = None
+        self._listener: Optional[asyncio.Task] = None
+        # (channel, key) of failed invalidations and number of attempt
+        self._invalidations: Dict[Tuple[str, str], int] = {}
+        self._attempts = count()
+        self._replay: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.url)
+
+    def available(self) -> bool:
+        """Checks that cache is configured and did not fail recently"""
+        return self.enabled and self._down_until <= monotonic()
+
+    async def _get_client(self) -> RespClient:
+        if self._client is None or self._client.closed:
+            # lock is created in loop of running application
+            if self._connecting is None:
+                self._connecting = asyncio.Lock()
+            async with self._connecting:
+                if self._client is None or self._client.closed:
+                    self._client = await RespClient.connect(self.url, self.timeout)
+        return self._client
+
+    async def _command(self, *args) -> Any:
+        """Runs command even when cache is unavailable, failure is raised"""
+        try:
+            client = await self._get_client()
+            result = await asyncio.wait_for(client.execute(*args), self.timeout)
+        except FAILURES + (RespError,) as error:
+            self.errors += 1
+            self._down_until = monotonic() + self.retry_seconds
+            logger.warning("Shared cache is unavailable: %r", error)
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+            raise
+        self._down_until = 0.0
+        return result
+
+    async def execute(self, *args) -> Any:
+        """Runs command, returns None when cache is unavailable"""
+        if not self.available():
+            return None
+        try:
+            result = await self._command(*args)
+        except FAILURES + (RespError,):
+            return None
+        self._replay_invalidations()
+        return result
+
+    async def get(self, key: str) -> Optional[bytes]:
+        """Gets value by key"""
+        value = await self.execute("GET", self.prefix + key)
+        if value is None or value == TOMBSTONE:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        """
+        Puts value which expires in ttl seconds. Value is not put over
+        tombstone, so value read before invalidation does not come back.
+        """
+        milliseconds = int(ttl * 1000)
+        if milliseconds > 0:
+            await self.execute(
+                "SET", self.prefix + key, value, "PX", milliseconds, "NX"
+            )
+
+    async def invalidate(self, channel: str, keys: List[str]) -> None:
+        """
+        Replaces keys by tombstones for tombstone_seconds and publishes
+        them to channel for other processes
+        """
+        if not self.enabled or not keys:
+            return
+        for key in keys:
+            self._invalidations.pop((channel, key), None)
+            self._invalidations[(channel, key)] = next(self._attempts)
+        while len(self._invalidations) > INVALIDATIONS_LIMIT:
+            item = next(iter(self._invalidations))
+            del self._invalidations[item]
+            logger.warning("Invalidation of %s is dropped", item[1])
+        await self._send_invalidations()
+
+    async def _send_invalidations(self) -> bool:
+        """Sends kept invalidations, they are kept again on failure"""
+        attempts = list(self._invalidations.items())
+        milliseconds = int(self.tombstone_seconds * 1000)
+        try:
+            await asyncio.gather(*[
+                self._command(
+                    "SET", self.prefix + key, TOMBSTONE, "PX", milliseconds
+                )
+                for (_, key), _ in attempts
+            ])
+            await asyncio.gather(*[
+                self._command("PUBLISH", channel, key)
+                for (channel, key), _ in attempts
+            ])
+        except FAILURES + (RespError,):
+            return False
+        for item, attempt in attempts:
+            # key invalidated again meanwhile is sent by its own attempt
+            if self._invalidations.get(item) == attempt:
+                del self._invalidations[item]
+        return True
+
+    def _replay_invalidations(self) -> None:
+        if self._invalidations and (self._replay is None or self._replay.done()):
+            self._replay = asyncio.ensure_future(self._send_invalidations())
+
+    def start_listener(
+        self,
+        channel: str,
+        on_message: Callable[[str], None],
+        on_reconnect: Callable[[], None],
+    ) -> None:
+        """
+        Starts task which passes messages of channel to on_message.
+        Messages are lost while connection is broken, so on_reconnect
+        is called when subscription is restored after failure.
+        """
+        if self.enabled and self._listener is None:
+            self._listener = asyncio.ensure_future(
+                self._listen(channel, on_message, on_reconnect)
+            )
+
+    async def _listen(
+        self,
+        channel: str,
+        on_message: Callable[[str], None],
+        on_reconnect: Callable[[], None],
+    ) -> None:
+        failed = False
+        while True:
+            writer = None
+            try:
+                reader, writer = await open_connection(self.url, self.timeout)
+                writer.write(encode_command(("SUBSCRIBE", channel)))
+                reply = await asyncio.wait_for(read_reply(reader), self.timeout)
+                if isinstance(reply, RespError):
+                    raise reply
+                if failed:
+                    on_reconnect()
+                    failed = False
+                self._replay_invalidations()
+                while True:
+                    message = await read_reply(reader)
+                    if isinstance(message, list) and message[0] == b"message":
+                        on_message(message[2].decode())
+            except FAILURES + (RespError,) as error:
+                failed = True
+                logger.warning("Listener of shared cache failed: %r", error)
+            finally:
+                if writer is not None:
+                    writer.close()
+            await asyncio.sleep(self.retry_seconds)
+
+    def close(self) -> None:
+        """Stops listener and closes connection"""
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+        if self._replay is not None:
+            self._replay.cancel()
+            self._replay = None
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns counters of this process"""
+        return {
+            "enabled": self.enabled,
+            "available": self.available(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "pending_invalidations": len(self._invalidations),
+        }
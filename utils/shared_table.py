@@ -0,0 +1,251 @@
+import logging
+import struct
+from hashlib import blake2b
+from multiprocessing import resource_tracker, shared_memory
+from time import monotonic, time
+from typing import Dict, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"SLRTBL01"
+# magic, number of slots, bytes of arena, generation,
+# unix time when loading of table started, count
+HEADER = struct.Struct("<8sQQQdQ")
+HEADER_SIZE = 64
+GENERATION = struct.Struct("<Qd")
+GENERATION_OFFSET = 24
+COUNT_OFFSET = 40
+# hash of short link, offset in arena, lengths of short link and URL,
+# link id, expiry as unix time (0 is never)
+SLOT = struct.Struct("<QIHHqd")
+MAX_LENGTH = 0xFFFF
+LOAD_FACTOR = 0.75
+READ_ATTEMPTS = 3
+ATTACH_RETRY_SECONDS = 5
+
+
+def key_hash(key: bytes) -> int:
+    """Hash which is the same in all processes, 0 marks empty slot"""
+    return int.from_bytes(blake2b(key, digest_size=8).digest(), "little") or 1
+
+
+def _untrack(memory: shared_memory.SharedMemory) -> None:
+    # resource tracker unlinks segment when any process which opened it
+    # exits, but the segment must outlive restarts of workers and loader
+    resource_tracker.unregister(memory._name, "shared_memory")
+
+
+class SharedRedirectTable:
+    """
+    Fixed-capacity open-addressing hash table of redirects in shared memory.
+    Short links and URLs are kept in arena after slots. Segment has two
+    halves: one loader process builds new table in the spare half and
+    switches generation. Workers read without locks and retry lookup
+    when generation changed while they read.
+    """
+
+    def __init__(self, name: str, capacity: int, arena_bytes: int, max_age: float):
+        self.name = name
+        self.capacity = capacity
+        self.slots = int(capacity / LOAD_FACTOR) + 1
+        self.arena_bytes = arena_bytes
+        self.max_age = max_age
+        self.half_size = self.slots * SLOT.size + arena_bytes
+        self.size = HEADER_SIZE + 2 * self.half_size
+        self.reset()
+
+    def reset(self) -> None:
+        """Forgets segment and counters, segment is not closed"""
+        self.hits = 0
+        self.misses = 0
+        self._memory: Optional[shared_memory.SharedMemory] = None
+        self._next_attach = 0.0
+        self._build: Optional[Tuple[int, int, int, float]] = None
+
+    def _open(self) -> Optional[shared_memory.SharedMemory]:
+        try:
+            memory = shared_memory.SharedMemory(self.name)
+        except FileNotFoundError:
+            return None
+        _untrack(memory)
+        magic, slots, arena_bytes = HEADER.unpack_from(memory.buf)[:3]
+        if (magic, slots, arena_bytes) != (MAGIC, self.slots, self.arena_bytes):
+            memory.close()
+            logger.warning("Shared table %s has other size", self.name)
+            return None
+        return memory
+
+    def attach(self) -> bool:
+        """Opens segment made by loader, retries not often than in few seconds"""
+        if self._memory is not None:
+            return True
+        now = monotonic()
+        if now < self._next_attach:
+            return False
+        self._next_attach = now + ATTACH_RETRY_SECONDS
+        self._memory = self._open()
+        return self._memory is not None
+
+    def create(self) -> None:
+        """Makes segment for loader or reuses segment of previous loader"""
+        memory = self._open()
+        if memory is None:
+            self.destroy()
+            memory = shared_memory.SharedMemory(self.name, create=True, size=self.size)
+            _untrack(memory)
+            HEADER.pack_into(
+                memory.buf, 0, MAGIC, self.slots, self.arena_bytes, 0, 0.0, 0
+            )
+        self._memory = memory
+
+    def destroy(self) -> None:
+        """Removes segment from system, workers keep their mappings"""
+        self.close()
+        try:
+            memory = shared_memory.SharedMemory(self.name)
+        except FileNotFoundError:
+            return
+        memory.close()
+        memory.unlink()
+
+    def close(self) -> None:
+        if self._memory is not None:
+            self._memory.close()
+            self._memory = None
+
+    def generation(self) -> int:
+        """Gets number of current table, 0 when nothing is loaded"""
+        if self._memory is None:
+            return 0
+        return GENERATION.unpack_from(self._memory.buf, GENERATION_OFFSET)[0]
+
+    def loaded_at(self) -> float:
+        """Gets unix time when loading of current table started"""
+        if self._memory is None:
+            return 0.0
+        return GENERATION.unpack_from(self._memory.buf, GENERATION_OFFSET)[1]
+
+    def get(self, short_text: str) -> Optional[Tuple[int, str, float]]:
+        """Gets link id, URL and expiry (0 is never) by short link"""
+        if self._memory is None and not self.attach():
+            return None
+        buf = self._memory.buf
+        key = short_text.encode()
+        digest = key_hash(key)
+        found = None
+        for _ in range(READ_ATTEMPTS):
+            generation, loaded_at = GENERATION.unpack_from(buf, GENERATION_OFFSET)
+            if not generation:
+                break
+            if time() - loaded_at > self.max_age:
+                # loader is gone, maybe other one made new segment
+                self.close()
+                break
+            base = HEADER_SIZE + generation % 2 * self.half_size
+            try:
+                found = self._find(buf, base, key, digest)
+            except (struct.error, ValueError):
+                found = None
+            if GENERATION.unpack_from(buf, GENERATION_OFFSET)[0] == generation:
+                break
+            found = None
+        if found is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return found
+
+    def _find(
+        self, buf: memoryview, base: int, key: bytes, digest: int
+    ) -> Optional[Tuple[int, str, float]]:
+        arena = base + self.slots * SLOT.size
+        index = digest % self.slots
+        for _ in range(self.slots):
+            slot_hash, offset, key_length, url_length, link_id, expiry = (
+                SLOT.unpack_from(buf, base + index * SLOT.size)
+            )
+            if not slot_hash:
+                return None
+            start = arena + offset
+            if (
+                slot_hash == digest
+                and key_length == len(key)
+                and buf[start:start + key_length] == key
+            ):
+                start += key_length
+                return link_id, str(buf[start:start + url_length], "utf-8"), expiry
+            index = index + 1 if index + 1 < self.slots else 0
+        return None
+
+    def start_build(self) -> None:
+        """Clears spare half of segment for new table, call it before query"""
+        buf = self._memory.buf
+        base = HEADER_SIZE + (self.generation() + 1) % 2 * self.half_size
+        end = base + self.slots * SLOT.size
+        chunk = bytes(min(end - base, 1 << 20))
+        for offset in range(base, end, len(chunk)):
+            size = min(len(chunk), end - offset)
+            buf[offset:offset + size] = chunk[:size]
+        self._build = (base, 0, 0, time())
+
+    def add(self, short_text: str, url: str, link_id: int, expiry: float) -> bool:
+        """Puts link to new table, returns False when table is full"""
+        base, position, count, started = self._build
+        key = short_text.encode()
+        value = url.encode()
+        if count >= self.capacity or (
+            position + len(key) + len(value) > self.arena_bytes
+        ):
+            return False
+        if len(key) > MAX_LENGTH or len(value) > MAX_LENGTH:
+            # such links are served from database
+            return True
+        buf = self._memory.buf
+        digest = key_hash(key)
+        index = digest % self.slots
+        while SLOT.unpack_from(buf, base + index * SLOT.size)[0]:
+            index = index + 1 if index + 1 < self.slots else 0
+        start = base + self.slots * SLOT.size + position
+        buf[start:start + len(key)] = key
+        buf[start + len(key):start + len(key) + len(value)] = value
+        SLOT.pack_into(
+            buf,
+            base + index * SLOT.size,
+            digest,
+            position,
+            len(key),
+            len(value),
+            link_id,
+            expiry,
+        )
+        self._build = (
+            base, position + len(key) + len(value), count + 1, started
+        )
+        return True
+
+    def finish_build(self) -> int:
+        """Makes new table current, returns number of links in it"""
+        _, _, count, started = self._build
+        buf = self._memory.buf
+        struct.pack_into("<Q", buf, COUNT_OFFSET, count)
+        GENERATION.pack_into(
+            buf, GENERATION_OFFSET, self.generation() + 1, started
+        )
+        self._build = None
+        return count
+
+    def stats(self) -> Dict[str, int]:
+        """Returns size of table and counters of this process"""
+        count = 0
+        if self._memory is not None:
+            count = struct.unpack_from("<Q", self._memory.buf, COUNT_OFFSET)[0]
+        return {
+            "attached": self._memory is not None,
+            "generation": self.generation(),
+            "count": count,
+            "capacity": self.capacity,
+            "bytes": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
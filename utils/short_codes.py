@@ -0,0 +1,130 @@
+import logging
+from collections import deque
+from threading import Lock
+from typing import List, Optional
+
+from hashids import Hashids
+from sqlalchemy import Sequence, func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+
+logger = logging.getLogger(__name__)
+
+INCREMENT_SQL = text(
+    "SELECT increment_by FROM pg_sequences"
+    " WHERE schemaname = coalesce(:schema, current_schema())"
+    " AND sequencename = :name"
+)
+
+
+class ShortCodeAllocator:
+    """
+    Gives unique short codes from blocks of ids leased from database sequence.
+    Sequence increment is the size of block, so every nextval gives a worker
+    own range of numbers which are encoded without going to database.
+    Increment is read from database before the first lease, block_size
+    is used only when sequence is not found.
+    """
+
+    def __init__(
+        self,
+        sequence: Sequence,
+        block_size: int,
+        salt: str,
+        min_length: int,
+        alphabet: str,
+    ):
+        self.sequence = sequence
+        self.block_size = block_size
+        self.hashids = Hashids(salt=salt, min_length=min_length, alphabet=alphabet)
+        self._blocks = deque()
+        self._lock = Lock()
+        self._checked = False
+
+    def encode(self, number: int) -> str:
+        """Encodes number to short code"""
+        return self.hashids.encode(number)
+
+    def decode(self, code: str) -> Optional[int]:
+        """Gets number of generated code, None for other strings"""
+        numbers = self.hashids.decode(code)
+        return numbers[0] if len(numbers) == 1 else None
+
+    def add_block(self, start: int) -> None:
+        """Adds leased block of numbers which starts from start"""
+        with self._lock:
+            self._blocks.append(range(start, start + self.block_size))
+
+    def reset(self) -> None:
+        """Forgets leased blocks, so forked processes never share them"""
+        with self._lock:
+            self._blocks.clear()
+
+    def take(self, count: int) -> List[int]:
+        """Takes up to count numbers from leased blocks"""
+        numbers = []
+        with self._lock:
+            while self._blocks and len(numbers) < count:
+                block = self._blocks[0]
+                need = count - len(numbers)
+                numbers.extend(block[:need])
+                if need >= len(block):
+                    self._blocks.popleft()
+                else:
+                    self._blocks[0] = block[need:]
+        return numbers
+
+    def increment_statement(self):
+        """Statement which gets increment of sequence in database"""
+        return INCREMENT_SQL.bindparams(
+            schema=self.sequence.schema, name=self.sequence.name
+        )
+
+    def set_increment(self, increment: Optional[int]) -> None:
+        """Makes block size equal to increment of sequence"""
+        self._checked = True
+        if increment is None or increment == self.block_size:
+            return
+        logger.warning(
+            "Sequence %s increments by %s, it is used instead of block size %s",
+            self.sequence.name, increment, self.block_size,
+        )
+        with self._lock:
+            self.block_size = increment
+            self._blocks.clear()
+
+    def lease_statement(self, count: int):
+        """Statement which leases enough blocks for count numbers"""
+        blocks = -(-count // self.block_size)
+        return select(self.sequence.next_value()).select_from(
+            func.generate_series(1, blocks)
+        )
+
+    def _add_blocks(self, starts: List[int]) -> None:
+        for start in starts:
+            self.add_block(start)
+
+    async def allocate(self, db: AsyncSession, count: int = 1) -> List[str]:
+        """Gets count new short codes, leases blocks when needed"""
+        numbers = self.take(count)
+        while len(numbers) < count:
+            if not self._checked:
+                self.set_increment(await db.scalar(self.increment_statement()))
+            need = count - len(numbers)
+            result = await db.execute(self.lease_statement(need))
+            self._add_blocks(result.scalars().all())
+            numbers += self.take(need)
+        return [self.encode(number) for number in numbers]
+
+    def allocate_sync(self, db: Session, count: int = 1) -> List[str]:
+        """Same as allocate but for sync session"""
+        numbers = self.take(count)
+        while len(numbers) < count:
+            if not self._checked:
+                self.set_increment(db.scalar(self.increment_statement()))
+            need = count - len(numbers)
+            result = db.execute(self.lease_statement(need))
+            self._add_blocks(result.scalars().all())
+            numbers += self.take(need)
+        return [self.encode(number) for number in numbers]
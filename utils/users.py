@@ -1,37 +1,88 @@
 from datetime import datetime, timedelta
+from functools import lru_cache
+from hashlib import sha256
+from time import time
 from typing import Optional
 
 # from fastapi.security import OAuth2PasswordBearer
-from passlib.context import CryptContext
-from jose import jwt
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
+import settings
 from models.user import User as UserModel
+from schemas.user import TokenData, User
 from settings import (
-    SECRET_KEY,
-    ALGORITHM
+    USER_CACHE_SIZE,
+    USER_CACHE_TTL_SECONDS,
+    HASHING_WORKERS,
+    HASHING_MAX_PENDING,
+    TOKEN_CACHE_SIZE,
+    TOKEN_CACHE_TTL_SECONDS,
 )
+from .cache import TTLLRUCache
+from .executors import BoundedExecutor
+
+user_cache = TTLLRUCache(USER_CACHE_SIZE, USER_CACHE_TTL_SECONDS)
+token_cache = TTLLRUCache(TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL_SECONDS)
+# key of tokens in token_cache, cache is flushed when it changes
+token_cache_signing_key = None
+hashing_executor = BoundedExecutor(
+    HASHING_WORKERS, HASHING_MAX_PENDING, name="hashing"
+)
+
+
+@event.listens_for(UserModel, "after_update")
+@event.listens_for(UserModel, "after_delete")
+def invalidate_cached_user(mapper, connection, target: UserModel) -> None:
+    """Drops changed user from cache"""
+    user_cache.pop(target.id)
+
+
+@lru_cache(maxsize=None)
+def get_pwd_context():
+    """Gets context for password hashing, passlib is loaded at first use"""
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+def cache_user(user: UserModel) -> User:
+    """Puts user to cache of authenticated users"""
+    cached_user = User.from_orm(user)
+    user_cache.set(cached_user.id, cached_user)
+    return cached_user
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+def get_token_claims(user: UserModel) -> dict:
+    """Gets claims of access token for user"""
+    return {
+        "sub": user.username,
+        "id": user.id,
+        "is_active": user.is_active,
+        "is_admin": user.is_admin,
+    }
 
-def verify_password(plain_password, hashed_password):
-    """Verify password"""
-    return pwd_context.verify(plain_password, hashed_password)
 
+async def verify_password(plain_password, hashed_password):
+    """Verify password in pool of hashing threads"""
+    return await hashing_executor.run(
+        get_pwd_context().verify, plain_password, hashed_password
+    )
 
-def get_password_hash(password):
-    """Gets password hash"""
-    return pwd_context.hash(password)
 
+async def get_password_hash(password):
+    """Gets password hash in pool of hashing threads"""
+    return await hashing_executor.run(get_pwd_context().hash, password)
 
-def authenticate_user(db, username: str, password: str):
+
+async def authenticate_user(db: AsyncSession, username: str, password: str):
     """Authenticate user in system"""
-    found_user = db.query(UserModel).filter(
-        UserModel.username == username
-    ).first()
+    result = await db.execute(
+        select(UserModel).filter(UserModel.username == username)
+    )
+    found_user = result.scalars().first()
     if not found_user:
         return False
-    if not verify_password(password, found_user.password):
+    if not await verify_password(password, found_user.password):
         return False
     return found_user
 
@@ -41,11 +92,55 @@ def create_access_token(
     expires_delta: Optional[timedelta] = None
 ):
     """Creates access token for authenticated user"""
+    from jose import jwt
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    encoded_jwt = jwt.encode(
+        to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM
+    )
     return encoded_jwt
+
+
+def decode_access_token(token: str) -> dict:
+    """Gets claims of access token, raises ValueError for invalid token"""
+    from jose import JWTError, jwt
+    try:
+        return jwt.decode(
+            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
+        )
+    except JWTError as error:
+        raise ValueError(str(error)) from error
+
+
+def get_token_data(token: str) -> TokenData:
+    """
+    Gets claims of verified access token.
+    Verified tokens are cached by their hash until expiration,
+    so signature is checked once per token.
+    Raises ValueError for invalid token.
+    """
+    global token_cache_signing_key
+    signing_key = (settings.SECRET_KEY, settings.ALGORITHM)
+    if signing_key != token_cache_signing_key:
+        # tokens signed by old key must be verified again
+        token_cache.clear()
+        token_cache_signing_key = signing_key
+    key = sha256(token.encode()).digest()
+    token_data = token_cache.get(key)
+    if token_data is None:
+        token_data = TokenData(**decode_access_token(token))
+        ttl = None
+        if token_data.exp is not None:
+            ttl = token_data.exp - time()
+        token_cache.set(key, token_data, ttl)
+    return token_data
+
+
+def warm_up_auth() -> None:
+    """Loads password hashing and token modules before the first request"""
+    get_pwd_context().handler().get_backend()
+    decode_access_token(create_access_token({"sub": "warm-up"}))